@@ -1,34 +1,45 @@
-import soundfile as sf
 import numpy as np
+from app.services.analysis.audio_io import frame_rms, load_audio
+from app.services.analysis.streaming import should_stream, stream_frame_rms
 
-def get_pause_to_speech_ratio(audio_path: str) -> dict:
+def get_pause_to_speech_ratio(audio_path: str = None, tracks: dict = None, y=None, sr: int = None, frames=None,
+                              stream: bool = None) -> dict:
     """
     Calculate speech and pause statistics from audio.
     Args:
         audio_path: Path to the audio file
+        tracks: Optional dict; if given, the per-frame RMS track is stored
+            in it as {"rms": (values, frames_per_second)}
+        y, sr: In-memory samples and sample rate, used instead of audio_path
+        frames: Precomputed (rms, hop_length) from audio_io.frame_rms; with
+            `sr` also given no audio is needed
+        stream: Read audio_path in float32 blocks instead of loading it whole
+            (None: only for files longer than ANALYSIS_STREAM_MIN_SECONDS)
     Returns:
         Dictionary containing pause and speech statistics
     """
     try:
-        # Load the audio file
-        audio_data, sample_rate = sf.read(audio_path)
-        
-        # Convert stereo to mono if necessary
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
-        
-        # Calculate RMS energy
-        frame_length = int(0.02 * sample_rate)  # 20ms frames
-        hop_length = int(0.01 * sample_rate)    # 10ms hop
-        
-        frames = []
-        for i in range(0, len(audio_data) - frame_length, hop_length):
-            frame = audio_data[i:i + frame_length]
-            frames.append(np.sqrt(np.mean(frame**2)))
+        if frames is None and y is None and should_stream(audio_path, stream):
+            # Long recording: frame it blockwise, only the frame track is kept
+            rms, hop_length, sample_rate, _ = stream_frame_rms(audio_path)
+            frames = (rms, hop_length)
+        elif frames is not None and y is None and sr is not None:
+            sample_rate = sr  # e.g. frames from a streaming pass
+        else:
+            # Load the audio (mono float32) from the buffer or the file
+            audio_data, sample_rate = load_audio(audio_path, y=y, sr=sr)
+
+        # Calculate RMS energy (20ms frames, 10ms hop)
+        if frames is None:
+            frames = frame_rms(audio_data, sample_rate)
+        frames, hop_length = frames
+
+        if tracks is not None:
+            tracks["rms"] = (frames, sample_rate / hop_length)
         
         # Simple energy threshold for speech/pause
         threshold = np.mean(frames) * 0.1
-        pause_frames = sum(1 for frame in frames if frame < threshold)
+        pause_frames = int(np.count_nonzero(frames < threshold))
         speech_frames = len(frames) - pause_frames
         
         # Convert frame counts to milliseconds
@@ -1,10 +1,13 @@
-import whisper
+from app.services import asr
 
-def detect_filler_words(audio_path: str) -> dict:
+def detect_filler_words(audio_path: str = None, y=None, sr: int = None, transcription: dict = None) -> dict:
     """
     Detects filler words in the audio file and returns statistics.
     Args:
         audio_path: Path to the audio file
+        y, sr: In-memory samples and sample rate, used instead of audio_path
+        transcription: An already computed asr.transcribe() result, used
+            instead of transcribing again
     Returns:
         Dictionary containing filler word statistics
     """
@@ -15,8 +18,15 @@ def detect_filler_words(audio_path: str) -> dict:
             "basically", "literally", "actually", "so", "anyway", "right"
         ]
         
-        model = whisper.load_model("base")
-        result = model.transcribe(audio_path)
+        # Shared model server if running, else a per-worker cached model
+        if transcription is not None:
+            result = transcription
+        elif y is not None:
+            result = asr.transcribe_samples(y, sr)
+        else:
+            result = asr.transcribe(audio_path)
+        if result.get("error"):
+            raise RuntimeError(result["error"])
         text = result["text"].lower()
         
         results = {}
@@ -1,38 +1,50 @@
-import soundfile as sf
 import numpy as np
 from scipy.signal import welch
+from app.services.analysis.audio_io import frame_rms, load_audio
+from app.services.analysis.streaming import ZeroCrossings, should_stream, stream_frame_rms
 
-def analyze_stress(audio_path: str) -> dict:
+def analyze_stress(audio_path: str = None, y=None, sr: int = None, frames=None, stream: bool = None,
+                   zero_crossings: ZeroCrossings = None) -> dict:
     """
     Analyze stress levels in speech based on audio features.
     Args:
         audio_path: Path to the audio file
+        y, sr: In-memory samples and sample rate, used instead of audio_path
+        frames: Precomputed (rms, hop_length) from audio_io.frame_rms
+        stream: Read audio_path in float32 blocks instead of loading it whole
+            (None: only for files longer than ANALYSIS_STREAM_MIN_SECONDS)
+        zero_crossings: Counted over the same blocks as `frames` by a
+            streaming pass; with both given no audio is needed
     Returns:
         Dictionary containing stress analysis results
     """
     try:
-        # Load the audio file
-        audio_data, sample_rate = sf.read(audio_path)
-        
-        # Convert stereo to mono if necessary
-        if len(audio_data.shape) > 1:
-            audio_data = np.mean(audio_data, axis=1)
-        
+        if frames is not None and zero_crossings is not None:
+            n_samples = zero_crossings.n_samples
+            zero_crossings = zero_crossings.count
+        elif frames is None and y is None and should_stream(audio_path, stream):
+            # Long recording: one blockwise pass; the sign of the last sample
+            # is carried so crossings on block boundaries are counted
+            counter = ZeroCrossings()
+            rms, _, _, n_samples = stream_frame_rms(audio_path, on_block=lambda block, _: counter.update(block))
+            frames = (rms, None)
+            zero_crossings = counter.count
+        else:
+            # Load the audio (mono float32) from the buffer or the file
+            audio_data, sample_rate = load_audio(audio_path, y=y, sr=sr)
+            zero_crossings = np.sum(np.abs(np.diff(np.signbit(audio_data))))
+            n_samples = len(audio_data)
+
         # Calculate features
-        # 1. Energy variability
-        frame_length = int(0.02 * sample_rate)  # 20ms frames
-        hop_length = int(0.01 * sample_rate)    # 10ms hop
-        
-        frames = []
-        for i in range(0, len(audio_data) - frame_length, hop_length):
-            frame = audio_data[i:i + frame_length]
-            frames.append(np.sqrt(np.mean(frame**2)))
+        # 1. Energy variability (20ms frames, 10ms hop)
+        if frames is None:
+            frames = frame_rms(audio_data, sample_rate)
+        frames, _ = frames
         
         energy_variance = float(np.var(frames))
         
         # 2. Pitch variability (using zero-crossing rate as simple proxy)
-        zero_crossings = np.sum(np.abs(np.diff(np.signbit(audio_data))))
-        pitch_variance = float(zero_crossings / len(audio_data))
+        pitch_variance = float(zero_crossings / n_samples)
         
         # Simple stress level classification based on both variances
         stress_score = (energy_variance + pitch_variance) / 2
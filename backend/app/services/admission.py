@@ -0,0 +1,116 @@
+# admission.py
+"""
+Bounded admission control for the analysis path.
+
+At most `max_in_flight` analyses run at once per worker process; up to
+`max_queue` more wait in FIFO order for a slot. Anything beyond that, or a
+request that waits longer than `max_queue_wait` seconds, is rejected right
+away with Overloaded so the caller can answer 503 + Retry-After. Admitted
+requests then see steady latency instead of every analysis slowing down
+together during a burst.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app.services import metrics
+
+QUEUE_WAIT_SECONDS = metrics.Histogram(
+    "virtuhire_analysis_queue_wait_seconds", "Time admitted analyses waited for a slot",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+REJECTED = metrics.Counter(
+    "virtuhire_analysis_rejected", "Analyses rejected by admission control", ("reason",))
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int, max_queue: int, max_queue_wait: float):
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.max_queue_wait = max_queue_wait
+        self.in_flight = 0
+        self._waiters = deque()
+        self._avg_service = 5.0  # seconds, EWMA of slot hold time
+
+    def _retry_after(self) -> int:
+        # Rough time until a newly queued request would get a slot
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_service * backlog / self.max_in_flight))
+
+    def _update_queue_depth(self):
+        metrics.QUEUE_DEPTH.set(len(self._waiters))
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns seconds spent queued. Raises Overloaded."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            QUEUE_WAIT_SECONDS.observe(0.0)
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            REJECTED.inc(reason="queue_full")
+            raise Overloaded("queue_full", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._update_queue_depth()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            if future.done():  # slot was handed over just as we timed out
+                self.release()
+            else:
+                future.cancel()
+            REJECTED.inc(reason="queue_timeout")
+            raise Overloaded("queue_timeout", self._retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+            self._update_queue_depth()
+        waited = time.perf_counter() - start
+        QUEUE_WAIT_SECONDS.observe(waited)
+        return waited
+
+    def release(self, held_for: float = None):
+        if held_for is not None:
+            self._avg_service = 0.8 * self._avg_service + 0.2 * held_for
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)  # hand the slot straight to the next waiter
+                self._update_queue_depth()
+                return
+        self.in_flight -= 1
+        self._update_queue_depth()
+
+    @asynccontextmanager
+    async def slot(self):
+        """`async with controller.slot() as queue_wait:` runs inside one slot."""
+        queue_wait = await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield queue_wait
+        finally:
+            self.release(time.perf_counter() - start)
+
+
+analysis_admission = AdmissionController(
+    max_in_flight=int(os.getenv("ANALYSIS_MAX_IN_FLIGHT", max(1, (os.cpu_count() or 2) // 2))),
+    max_queue=int(os.getenv("ANALYSIS_MAX_QUEUE", "16")),
+    max_queue_wait=float(os.getenv("ANALYSIS_MAX_QUEUE_WAIT", "30")),
+)
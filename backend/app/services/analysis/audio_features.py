@@ -1,16 +1,44 @@
+import numpy as np
 from pydub import AudioSegment, silence
+from app.services.analysis.audio_io import to_mono_float32
+from app.services.analysis.silence import dbfs, detect_silence, pause_distribution
 
-def get_pause_to_speech_ratio(file_path: str):
+MIN_SILENCE_MS = 500      # at least 0.5s silence
+RELATIVE_THRESH_DB = -14  # threshold below avg dBFS
+
+def get_pause_to_speech_ratio(file_path: str = None, y=None, sr: int = None, reference: bool = False):
+    """
+    Pause-to-speech ratio plus the distribution of pause lengths.
+    reference=True detects silence with pydub.silence (slow; kept to check
+    the vectorized detector against).
+    """
     try:
-        audio = AudioSegment.from_file(file_path, format="wav")
-        total_duration_ms = len(audio)
+        if y is None:
+            audio = AudioSegment.from_file(file_path, format="wav")
+            pcm = np.array(audio.get_array_of_samples())
+            frame_rate, channels, max_amplitude = audio.frame_rate, audio.channels, audio.max_possible_amplitude
+        else:
+            # in-memory float samples -> 16-bit mono PCM
+            pcm = (np.clip(to_mono_float32(y), -1.0, 1.0) * 32767).astype("<i2")
+            frame_rate, channels, max_amplitude = int(sr), 1, 32768
+        total_duration_ms = round(1000 * (pcm.size // channels / frame_rate))
 
         # Detect silence chunks (pause segments)
-        silence_chunks = silence.detect_silence(
-            audio, 
-            min_silence_len=500,  # at least 0.5s silence
-            silence_thresh=audio.dBFS - 14  # threshold below avg dBFS
-        )
+        if reference:
+            if y is not None:
+                audio = AudioSegment(pcm.tobytes(), frame_rate=frame_rate, sample_width=2, channels=1)
+            silence_chunks = silence.detect_silence(
+                audio,
+                min_silence_len=MIN_SILENCE_MS,
+                silence_thresh=audio.dBFS + RELATIVE_THRESH_DB
+            )
+        else:
+            silence_chunks = detect_silence(
+                pcm, frame_rate,
+                min_silence_len=MIN_SILENCE_MS,
+                silence_thresh=dbfs(pcm, max_amplitude) + RELATIVE_THRESH_DB,
+                channels=channels, max_amplitude=max_amplitude
+            )
 
         total_silence_ms = sum(end - start for start, end in silence_chunks)
         total_speech_ms = total_duration_ms - total_silence_ms
@@ -20,7 +48,8 @@ def get_pause_to_speech_ratio(file_path: str):
             "total_duration_ms": int(total_duration_ms),
             "total_silence_ms": int(total_silence_ms),
             "total_speech_ms": int(total_speech_ms),
-            "pause_to_speech_ratio": float(ratio)
+            "pause_to_speech_ratio": float(ratio),
+            "pauses": pause_distribution(silence_chunks)
         }
     except Exception as e:
         return {"error": f"Pause-to-speech analysis failed: {str(e)}"}
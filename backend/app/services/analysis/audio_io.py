@@ -0,0 +1,124 @@
+# audio_io.py
+import struct
+
+import numpy as np
+import soundfile as sf
+
+try:
+    import opuslib
+except ImportError:  # optional: only needed for format=opus uploads
+    opuslib = None
+
+# Raw upload formats (no container): name -> sample dtype
+RAW_PCM_FORMATS = {"pcm_f32le": "<f4", "pcm_s16le": "<i2"}
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def to_mono_float32(y) -> np.ndarray:
+    """Downmix (frames, channels) to mono float32 without a float64 detour."""
+    y = np.asarray(y)
+    if y.ndim > 1:
+        y = y.mean(axis=1, dtype=np.float32)
+    return y.astype(np.float32, copy=False)
+
+
+def load_audio(audio_path: str = None, y=None, sr: int = None):
+    """
+    Return (mono float32 samples, sample_rate) from either a file path or an
+    in-memory buffer. Analyzers call this so they work on both.
+    """
+    if y is not None:
+        if sr is None:
+            raise ValueError("sr is required when passing samples")
+        return to_mono_float32(y), int(sr)
+    data, sample_rate = sf.read(audio_path, dtype="float32")
+    return to_mono_float32(data), sample_rate
+
+
+def segment_to_array(segment):
+    """
+    Convert a pydub AudioSegment to (float32 samples in -1..1, sample_rate),
+    skipping the WAV export / re-read round trip.
+    """
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    return to_mono_float32(samples), segment.frame_rate
+
+
+def frame_rms(y, sr: int, frame_ms: float = 20, hop_ms: float = 10):
+    """
+    Per-frame RMS energy, vectorized. Same framing as the analyzers' old
+    loop: frames start every hop up to (but excluding) len(y) - frame_length.
+    Returns (rms float32 array, hop_length).
+    """
+    y = np.asarray(y, dtype=np.float32)
+    frame_length = int(frame_ms / 1000 * sr)
+    hop_length = int(hop_ms / 1000 * sr)
+    n_frames = len(range(0, len(y) - frame_length, hop_length))
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32), hop_length
+    return window_rms(y, frame_length, hop_length, n_frames), hop_length
+
+
+def window_rms(y: np.ndarray, frame_length: int, hop_length: int, n_frames: int) -> np.ndarray:
+    """
+    RMS of the n_frames windows y[i*hop : i*hop + frame_length] (float32).
+    Sums each window with np.add.reduceat over interleaved start/end
+    indices, so the only temporary the size of y is y**2 (materializing
+    the overlapping windows would be frame_length / hop_length times it).
+    """
+    starts = np.arange(n_frames) * hop_length
+    bounds = np.empty(2 * n_frames, dtype=np.intp)
+    bounds[0::2] = starts
+    bounds[1::2] = starts + frame_length
+    if bounds[-1] == len(y):
+        # reduceat indices must be < len(y); the last start's segment runs to the end anyway
+        bounds = bounds[:-1]
+    squares = np.square(y, dtype=np.float32)
+    energy = np.add.reduceat(squares, bounds)[0::2]  # float32: a dtype= argument would cast all of squares
+    return np.sqrt(energy / np.float32(frame_length))
+
+
+def decode_pcm(data, fmt: str, sr: int, channels: int = 1):
+    """
+    (mono float32, sr) from headerless little-endian PCM bytes. Mono
+    float32 input is returned as a read-only view on `data` (no copy);
+    int16 costs one conversion pass.
+    """
+    dtype = np.dtype(RAW_PCM_FORMATS[fmt])
+    if len(data) % (dtype.itemsize * channels):
+        raise ValueError(f"{len(data)} bytes is not a whole number of {fmt} frames x {channels} channels")
+    samples = np.frombuffer(data, dtype=dtype)
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    if dtype.kind == "i":
+        samples = samples.astype(np.float32) / np.float32(32768)
+    return to_mono_float32(samples), int(sr)
+
+
+def decode_opus_frames(data, sr: int, channels: int = 1):
+    """
+    (mono float32, sr) from raw Opus packets, each prefixed with its length
+    as a 2-byte little-endian integer (e.g. WebCodecs AudioEncoder output).
+    Needs opuslib (libopus); no container demuxing or ffmpeg involved.
+    """
+    if opuslib is None:
+        raise RuntimeError("Opus uploads need the optional opuslib package")
+    if sr not in OPUS_SAMPLE_RATES:
+        raise ValueError(f"Opus sample rate must be one of {OPUS_SAMPLE_RATES}")
+    decoder = opuslib.Decoder(sr, channels)
+    max_frame = sr * 120 // 1000  # longest Opus packet is 120 ms
+    view = memoryview(data)
+    pcm, pos = [], 0
+    while pos < len(view):
+        if pos + 2 > len(view):
+            raise ValueError("Truncated Opus packet header")
+        (length,) = struct.unpack_from("<H", view, pos)
+        pos += 2
+        if pos + length > len(view):
+            raise ValueError("Truncated Opus packet")
+        pcm.append(decoder.decode(bytes(view[pos:pos + length]), max_frame))
+        pos += length
+    return decode_pcm(b"".join(pcm), "pcm_s16le", sr, channels)
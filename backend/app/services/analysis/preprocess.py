@@ -1,43 +1,173 @@
 # preprocess.py
+import os
+import time
+
 import librosa
 import numpy as np
 import soundfile as sf
 import noisereduce as nr
 
-def preprocess_audio(in_path: str, out_path: str,
-                     target_sr: int = 16000,
-                     denoise: bool = True,
-                     highpass: float = 80.0):
+from app.services import metrics
+from app.services.analysis.audio_io import to_mono_float32
+
+# Inputs whose estimated SNR is at or above this are not denoised
+DENOISE_MIN_SNR_DB = float(os.getenv("DENOISE_MIN_SNR_DB", "25"))
+
+NOISE_FRAME_MS = 20
+NOISE_PROFILE_MIN_S = 0.25   # shortest leading silence worth using as a profile
+NOISE_PROFILE_MAX_S = 2.0
+
+DENOISE_RUNS = metrics.Counter(
+    "virtuhire_denoise_runs", "Denoise decisions in preprocess_audio", ("outcome",))
+DENOISE_SECONDS = metrics.Histogram(
+    "virtuhire_denoise_duration_seconds", "Time spent in noise reduction",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+INPUT_SNR_DB = metrics.Histogram(
+    "virtuhire_preprocess_input_snr_db", "Estimated SNR of analysis inputs",
+    buckets=(0, 5, 10, 15, 20, 25, 30, 40, 50, 60))
+
+
+def _frame_rms(y: np.ndarray, sr: int, frame_ms: int = NOISE_FRAME_MS) -> np.ndarray:
+    frame = max(int(sr * frame_ms / 1000), 1)
+    n_frames = len(y) // frame
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = y[:n_frames * frame].reshape(n_frames, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def estimate_snr(y: np.ndarray, sr: int):
+    """
+    Fast SNR estimate from frame energies: the quietest frames (10th
+    percentile RMS) stand in for the noise floor, the loudest (95th) for
+    speech. Returns (snr_db, noise_floor_rms).
+    """
+    return snr_from_frames(_frame_rms(y, sr))
+
+
+def snr_from_frames(rms: np.ndarray):
+    """estimate_snr() from precomputed _frame_rms() values."""
+    if rms.size == 0:
+        return float("inf"), 0.0
+    noise, signal = np.percentile(rms, [10, 95])
+    if noise <= 1e-10:
+        return float("inf"), float(noise)
+    return float(20 * np.log10(max(signal, 1e-10) / noise)), float(noise)
+
+
+def leading_noise(y: np.ndarray, sr: int, noise_floor: float):
+    """
+    Samples of the silence before the first loud frame, for use as a
+    stationary noise profile. Returns None when it is too short.
     """
-    - Loads audio (librosa), optionally denoises (noisereduce),
-      applies a gentle highpass, normalizes and resamples to target_sr,
-      and writes a 16-bit WAV to out_path.
-    - Returns (y, sr) loaded array (after processing).
+    rms = _frame_rms(y, sr)
+    frame = max(int(sr * NOISE_FRAME_MS / 1000), 1)
+    loud = np.flatnonzero(rms > 2.0 * noise_floor)
+    quiet_frames = int(loud[0]) if loud.size else rms.size
+    n_samples = min(quiet_frames * frame, int(NOISE_PROFILE_MAX_S * sr))
+    if n_samples < NOISE_PROFILE_MIN_S * sr:
+        return None
+    return y[:n_samples]
+
+
+def denoise_adaptive(y: np.ndarray, sr: int, min_snr_db: float = None) -> np.ndarray:
+    """
+    Denoise only when the input needs it.
+    - Skips noisereduce entirely when the estimated SNR >= min_snr_db
+      (pass min_snr_db=float("-inf") to always denoise).
+    - Otherwise uses a stationary noise profile from leading silence, which
+      is much cheaper than the non-stationary default; falls back to the
+      non-stationary mode when there is no usable leading silence.
+    """
+    if min_snr_db is None:
+        min_snr_db = DENOISE_MIN_SNR_DB
+    snr_db, noise_floor = estimate_snr(y, sr)
+    if np.isfinite(snr_db):
+        INPUT_SNR_DB.observe(snr_db)
+    if snr_db >= min_snr_db:
+        DENOISE_RUNS.inc(outcome="skipped")
+        return y
+
+    start = time.perf_counter()
+    try:
+        y_noise = leading_noise(y, sr, noise_floor)
+        if y_noise is not None:
+            out = nr.reduce_noise(y=y, sr=sr, y_noise=y_noise, stationary=True)
+            outcome = "stationary"
+        else:
+            out = nr.reduce_noise(y=y, sr=sr)
+            outcome = "nonstationary"
+        y = out.astype(np.float32, copy=False)
+    except Exception as e:
+        print(f"Denoise failed, using input as is: {e}")
+        outcome = "failed"
+    DENOISE_SECONDS.observe(time.perf_counter() - start)
+    DENOISE_RUNS.inc(outcome=outcome)
+    return y
+
+
+def _peak_normalize(y: np.ndarray) -> np.ndarray:
+    # normalize to -1..1 (stays float32)
+    peak = float(np.max(np.abs(y))) if y.size else 0.0
+    if peak > 0:
+        y = y / np.float32(peak)
+    return y
+
+
+def enhance_speech(y: np.ndarray, sr: int,
+                   denoise: bool = True,
+                   highpass: float = 80.0,
+                   min_snr_db: float = None) -> np.ndarray:
+    """
+    Recognizer input derived from the analysis waveform.
+    - Optionally denoises (SNR-gated, see denoise_adaptive), applies a gentle
+      high-frequency pre-emphasis and peak-normalizes again.
+    - Only for transcription: both steps move frame energies and zero
+      crossings, so the pause/stress analyzers keep the plain waveform.
     """
-    y, sr = librosa.load(in_path, sr=None, mono=True)
-    # optional denoise (gentle)
     if denoise:
-        try:
-            y = nr.reduce_noise(y=y, sr=sr)
-        except Exception:
-            pass
+        y = denoise_adaptive(y, sr, min_snr_db)
 
     # highpass filter (simple - remove very low rumble)
     if highpass and highpass > 0:
         # use librosa's highpass via FFT (simple)
         # but for simplicity use librosa.effects.preemphasis for mild boost
         y = librosa.effects.preemphasis(y)
+    return _peak_normalize(y)
 
-    # normalize to -1..1
-    peak = np.max(np.abs(y)) if y.size else 1.0
-    if peak > 0:
-        y = y / peak
 
-    # resample
-    if sr != target_sr:
-        y = librosa.resample(y, orig_sr=sr, target_sr=target_sr)
-        sr = target_sr
+def preprocess_audio(audio, out_path: str = None,
+                     target_sr: int = 16000,
+                     denoise: bool = False,
+                     highpass: float = 0.0,
+                     sr: int = None,
+                     min_snr_db: float = None):
+    """
+    In-memory normalize/resample stage for the analysis pipeline.
+    - `audio` is a file path or a sample array (then `sr` is required).
+    - Resamples to target_sr FIRST, then peak-normalizes to -1..1, all as
+      float32. This is the waveform the energy/ZCR analyzers measure.
+    - denoise / highpass additionally apply enhance_speech(); the pipeline
+      does that itself for the transcript only.
+    - Writes a 16-bit WAV only if out_path is given.
+    - Returns (y, sr) with y as a mono float32 array.
+    """
+    if isinstance(audio, str):
+        # librosa resamples while loading
+        y, sr = librosa.load(audio, sr=target_sr, mono=True, dtype=np.float32)
+    else:
+        if sr is None:
+            raise ValueError("sr is required when passing samples")
+        y = to_mono_float32(audio)
+        if sr != target_sr:
+            y = librosa.resample(y, orig_sr=sr, target_sr=target_sr)
+            sr = target_sr
+
+    if denoise or highpass:
+        y = enhance_speech(y, sr, denoise=denoise, highpass=highpass, min_snr_db=min_snr_db)
+    else:
+        y = _peak_normalize(y)
 
-    # write 16-bit PCM wav
-    sf.write(out_path, y, sr, subtype="PCM_16")
+    if out_path:
+        sf.write(out_path, y, sr, subtype="PCM_16")
     return y, sr
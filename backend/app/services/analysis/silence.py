@@ -0,0 +1,94 @@
+# silence.py
+"""
+Vectorized equivalent of pydub.silence.detect_silence.
+
+pydub slides a min_silence_len window in 1 ms steps and computes each
+window's RMS in a Python loop. Here every window's sum of squares comes from
+one cumulative sum, so the whole scan is a few array operations. The window
+bounds, integer RMS (floor, like audioop.rms) and the rule for merging
+overlapping windows are pydub's. For the same PCM the intervals are identical.
+"""
+import math
+
+import numpy as np
+
+
+def pcm_rms(pcm) -> int:
+    """audioop.rms of the whole buffer (floor of the root mean square)."""
+    pcm = np.asarray(pcm)
+    if pcm.size == 0:
+        return 0
+    squares = np.square(pcm, dtype=np.int64)
+    return int(np.sqrt(float(squares.sum()) / pcm.size))
+
+
+def dbfs(pcm, max_amplitude: int = 32768) -> float:
+    """AudioSegment.dBFS for an integer PCM buffer."""
+    rms = pcm_rms(pcm)
+    if not rms:
+        return -float("infinity")
+    return 20 * math.log(rms / max_amplitude, 10)  # pydub.utils.ratio_to_db, bit for bit
+
+
+def detect_silence(pcm, sr: int, min_silence_len: int = 1000, silence_thresh: float = -16.0,
+                   channels: int = 1, max_amplitude: int = 32768) -> list:
+    """
+    Silent sections [start_ms, end_ms] of integer PCM, as pydub returns them
+    for seek_step=1.
+
+    Args:
+        pcm: integer samples, interleaved if channels > 1
+        sr: frame rate
+        min_silence_len: shortest silence reported, in ms
+        silence_thresh: dBFS at or below which a window counts as silent
+        channels: interleaved channel count
+        max_amplitude: AudioSegment.max_possible_amplitude (32768 for 16-bit)
+    """
+    pcm = np.asarray(pcm)
+    n_frames = pcm.size // channels
+    seg_len = round(1000 * (n_frames / sr))
+    if seg_len < min_silence_len:
+        return []
+    thresh = 10 ** (silence_thresh / 20) * max_amplitude
+
+    # Sum of squares per frame, then a prefix sum; exact in int64
+    squares = np.square(pcm[:n_frames * channels].reshape(n_frames, channels), dtype=np.int64).sum(axis=1)
+    prefix = np.zeros(n_frames + 2, dtype=np.int64)
+    np.cumsum(squares, out=prefix[1:n_frames + 1])
+    prefix[n_frames + 1:] = prefix[n_frames]  # pydub zero-pads a slice that overruns the data
+
+    # Window i covers frames [int(i * sr / 1000), int((i + min_silence_len) * sr / 1000))
+    starts_ms = np.arange(seg_len - min_silence_len + 1, dtype=np.int64)
+    begin = np.minimum((starts_ms * sr / 1000).astype(np.int64), n_frames + 1)
+    end = np.minimum(((starts_ms + min_silence_len) * sr / 1000).astype(np.int64), n_frames + 1)
+    counts = (end - begin) * channels
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rms = np.floor(np.sqrt((prefix[end] - prefix[begin]).astype(np.float64) / counts))
+    rms[counts == 0] = 0
+    silent_starts = starts_ms[rms <= thresh]
+    if silent_starts.size == 0:
+        return []
+
+    # Windows whose starts are more than min_silence_len apart begin a new range
+    breaks = np.flatnonzero(np.diff(silent_starts) > min_silence_len)
+    range_starts = np.concatenate(([silent_starts[0]], silent_starts[breaks + 1]))
+    range_ends = np.concatenate((silent_starts[breaks], [silent_starts[-1]])) + min_silence_len
+    return [[int(s), int(e)] for s, e in zip(range_starts, range_ends)]
+
+
+def pause_distribution(ranges) -> dict:
+    """Count, total, longest, mean and percentiles of pause lengths in ms."""
+    lengths = np.array([end - start for start, end in ranges], dtype=np.float64)
+    if lengths.size == 0:
+        return {"count": 0, "total_ms": 0, "longest_ms": 0, "mean_ms": 0.0,
+                "p50_ms": 0.0, "p90_ms": 0.0, "p95_ms": 0.0}
+    p50, p90, p95 = np.percentile(lengths, [50, 90, 95])
+    return {
+        "count": int(lengths.size),
+        "total_ms": int(lengths.sum()),
+        "longest_ms": int(lengths.max()),
+        "mean_ms": float(lengths.mean()),
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p95_ms": float(p95),
+    }
@@ -0,0 +1,182 @@
+# streaming.py
+"""
+Blockwise helpers so long recordings can be analyzed in bounded memory.
+
+Audio is read from disk in fixed-size float32 blocks (soundfile.blocks, or
+slices of a memory-mapped array) and downmixed per block; per-frame state
+that spans a block boundary is carried over, and summary statistics are
+accumulated with Welford/Chan updates instead of keeping every sample around.
+
+preprocessed_blocks() yields what preprocess_audio() would return, block by
+block, so reanalyze.py can run the frame-based analyzers over long stored
+recordings without holding them in memory.
+"""
+import os
+
+import numpy as np
+import soundfile as sf
+
+from app.services.analysis.audio_io import window_rms
+
+# Files longer than this are analyzed blockwise when given as a path
+STREAM_MIN_SECONDS = float(os.getenv("ANALYSIS_STREAM_MIN_SECONDS", "600"))
+BLOCK_SECONDS = float(os.getenv("ANALYSIS_BLOCK_SECONDS", "10"))
+
+
+def should_stream(audio_path: str, stream=None) -> bool:
+    """stream=None decides by duration; True/False forces the mode."""
+    if stream is not None or audio_path is None:
+        return bool(stream) and audio_path is not None
+    try:
+        return sf.info(audio_path).duration > STREAM_MIN_SECONDS
+    except RuntimeError:
+        return False
+
+
+def iter_blocks(source, block_seconds: float = None, sample_rate: int = None, block_multiple: int = 1):
+    """
+    Yield (mono float32 block, sample_rate) of about block_seconds each.
+    `source` is a file path, or a mono array (e.g. np.memmap) with its
+    `sample_rate`; block lengths are rounded down to `block_multiple`.
+    """
+    if not isinstance(source, str):
+        blocksize = max(int((block_seconds or BLOCK_SECONDS) * sample_rate) // block_multiple, 1) * block_multiple
+        for start in range(0, len(source), blocksize):
+            yield np.array(source[start:start + blocksize], dtype=np.float32), sample_rate
+        return
+    sample_rate = sf.info(source).samplerate
+    blocksize = max(int((block_seconds or BLOCK_SECONDS) * sample_rate) // block_multiple, 1) * block_multiple
+    for block in sf.blocks(source, blocksize=blocksize, dtype="float32", always_2d=True):
+        if block.shape[1] > 1:
+            block = block.mean(axis=1, dtype=np.float32)
+        else:
+            block = block[:, 0]
+        yield block, sample_rate
+
+
+class RunningStats:
+    """
+    Streaming mean / variance (Chan et al. parallel update of Welford's
+    method). update() takes a batch of observations along axis 0; they may
+    be scalars or vectors (e.g. MFCC frames).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = values.shape[0] if values.ndim else 1
+        if n == 0:
+            return
+        batch_mean = values.mean(axis=0)
+        batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self._m2 = self._m2 + batch_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def var(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+
+class FrameRMS:
+    """
+    Per-frame RMS over a stream of blocks, identical to audio_io.frame_rms
+    on the whole signal. Samples of a frame that straddles a block boundary
+    are carried into the next update().
+    """
+
+    def __init__(self, sample_rate: int, frame_ms: float = 20, hop_ms: float = 10):
+        self.frame_length = int(frame_ms / 1000 * sample_rate)
+        self.hop_length = int(hop_ms / 1000 * sample_rate)
+        self.n_samples = 0
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._chunks = []
+
+    def update(self, block: np.ndarray):
+        self.n_samples += len(block)
+        buf = np.concatenate([self._carry, block]) if self._carry.size else block
+        n = (len(buf) - self.frame_length) // self.hop_length + 1 if len(buf) >= self.frame_length else 0
+        if n > 0:
+            self._chunks.append(window_rms(buf, self.frame_length, self.hop_length, n))
+        # keep only the tail that the next frame starts in (copied, so the block can be freed)
+        self._carry = np.array(buf[n * self.hop_length:], dtype=np.float32)
+
+    def finish(self) -> np.ndarray:
+        """All frame RMS values (float32). The last frame is dropped like in frame_rms."""
+        rms = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.float32)
+        return rms[:len(range(0, self.n_samples - self.frame_length, self.hop_length))]
+
+
+class ZeroCrossings:
+    """Sign changes over a stream of blocks, counting those on block boundaries."""
+
+    def __init__(self):
+        self.count = 0
+        self.n_samples = 0
+        self._last_sign = None
+
+    def update(self, block: np.ndarray):
+        signs = np.signbit(block)
+        if not signs.size:
+            return
+        if self._last_sign is not None:
+            self.count += int(signs[0] != self._last_sign)
+        self.count += int(np.count_nonzero(signs[1:] != signs[:-1]))
+        self._last_sign = signs[-1]
+        self.n_samples += signs.size
+
+
+def preprocessed_blocks(source, sample_rate: int = None, target_sr: int = 16000, block_seconds: float = None):
+    """
+    Blocks of preprocess_audio(source, target_sr=target_sr) in bounded
+    memory, or None if that needs the whole signal (the source isn't at
+    target_sr, so it would be resampled).
+
+    `source` is a path or a mono array at `sample_rate`. The first pass
+    finds the peak; iterating the returned generator is the second pass,
+    which divides every block by it. The output is bit-identical to the
+    in-memory stage.
+    """
+    if isinstance(source, str):
+        sample_rate = sf.info(source).samplerate
+    if sample_rate != target_sr:
+        return None
+
+    peak, n_samples = 0.0, 0
+    for block, _ in iter_blocks(source, block_seconds, sample_rate):
+        if block.size:
+            peak = max(peak, float(np.max(np.abs(block))))
+        n_samples += block.size
+    if not n_samples:
+        return None
+
+    def normalized():
+        for block, _ in iter_blocks(source, block_seconds, sample_rate):
+            yield block / np.float32(peak) if peak > 0 else block
+
+    return normalized()
+
+
+def stream_frame_rms(audio_path: str, on_block=None, block_seconds: float = None):
+    """
+    Frame RMS of a file, read blockwise. `on_block(block, sample_rate)` is
+    called for every block so callers can accumulate their own statistics
+    in the same pass. Returns (rms, hop_length, sample_rate, n_samples).
+    """
+    sample_rate = sf.info(audio_path).samplerate
+    acc = FrameRMS(sample_rate)
+    for block, _ in iter_blocks(audio_path, block_seconds):
+        acc.update(block)
+        if on_block is not None:
+            on_block(block, sample_rate)
+    return acc.finish(), acc.hop_length, sample_rate, acc.n_samples
@@ -1,15 +1,36 @@
 # stress_detection.py
 import numpy as np
 import librosa
+from app.services.analysis.audio_io import to_mono_float32
+from app.services.analysis.streaming import RunningStats, BLOCK_SECONDS, should_stream
 
-def analyze_stress(wav_path: str):
+FRAME_LENGTH = 2048  # librosa defaults
+HOP_LENGTH = 512
+
+def magnitude_spectrogram(y):
+    """|STFT| with librosa's default framing, as spectral_centroid/mfcc compute it."""
+    return np.abs(librosa.stft(y, n_fft=FRAME_LENGTH, hop_length=HOP_LENGTH))
+
+
+def analyze_stress(wav_path: str = None, tracks: dict = None, y=None, sr: int = None,
+                   stream: bool = None, spectrogram=None):
     """
     Compute pitch (pyin), jitter-like metric, shimmer-like metric (approx),
     MFCC and spectral centroid variability. Combine into a simple heuristic score.
     Returns native python types.
+    If `tracks` is a dict, the frame-level RMS, F0, spectral centroid and
+    MFCC tracks are stored in it as {name: (values, frames_per_second)}.
+    Pass in-memory samples as `y`/`sr` to skip loading `wav_path`, and their
+    magnitude_spectrogram() as `spectrogram` if it is already computed.
+    Long files (or stream=True) are analyzed blockwise, see _analyze_stress_stream.
     """
     try:
-        y, sr = librosa.load(wav_path, sr=None, mono=True)
+        if y is None and should_stream(wav_path, stream):
+            return _analyze_stress_stream(wav_path, tracks)
+        if y is None:
+            y, sr = librosa.load(wav_path, sr=None, mono=True)
+        else:
+            y = to_mono_float32(y)
 
         # --- Energy / RMS stats
         rms = librosa.feature.rms(y=y)
@@ -17,10 +38,12 @@ def analyze_stress(wav_path: str):
         rms_std = float(np.std(rms)) if rms.size else 0.0
 
         # --- Pitch (F0) using pyin (more robust)
+        f0_track = None
         try:
             f0, voiced_flag, voiced_probs = librosa.pyin(y, fmin=50, fmax=400, sr=sr)
             # f0 is an array with nan where unvoiced
             f0_clean = f0[~np.isnan(f0)]
+            f0_track = f0
         except Exception:
             # fallback to piptrack
             pitches, mags = librosa.piptrack(y=y, sr=sr)
@@ -45,36 +68,109 @@ def analyze_stress(wav_path: str):
         # using short-term RMS variability as proxy
         shimmer = float(rms_std / (avg_rms + 1e-9))
 
-        # --- Spectral features (centroid, bandwidth)
-        cent = librosa.feature.spectral_centroid(y=y, sr=sr)
+        # --- Spectral features (centroid, bandwidth); one STFT serves centroid and MFCC
+        S = spectrogram if spectrogram is not None else magnitude_spectrogram(y)
+        cent = librosa.feature.spectral_centroid(S=S, sr=sr)
         cent_std = float(np.std(cent)) if cent.size else 0.0
 
         # --- MFCC variance (emotion related)
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+        mel = librosa.feature.melspectrogram(S=S ** 2, sr=sr)
+        mfcc = librosa.feature.mfcc(S=librosa.power_to_db(mel), sr=sr, n_mfcc=13)
         mfcc_var = float(np.mean(np.var(mfcc, axis=1))) if mfcc.size else 0.0
 
-        # --- Heuristic scoring (tweak weights experimentally)
-        # Higher pitch_std, jitter, shimmer, mfcc_var => higher stress
-        score = (pitch_std / 50.0) + (jitter * 5.0) + (shimmer * 5.0) + (mfcc_var * 0.1)
-        score = float(round(score, 3))
+        if tracks is not None:
+            frame_rate = sr / 512  # librosa default hop_length
+            tracks["rms"] = (rms[0], frame_rate)
+            tracks["spectral_centroid"] = (cent[0], frame_rate)
+            tracks["mfcc"] = (mfcc.T, frame_rate)
+            if f0_track is not None:
+                tracks["f0"] = (f0_track, frame_rate)
 
-        if score < 0.5:
-            level = "Low Stress"
-        elif score < 1.2:
-            level = "Moderate Stress"
-        else:
-            level = "High Stress"
-
-        return {
-            "stress_score": score,
-            "stress_level": level,
-            "pitch_std": float(round(pitch_std, 3)),
-            "pitch_mean": float(round(pitch_mean, 3)),
-            "jitter": float(round(jitter, 6)),
-            "shimmer": float(round(shimmer, 6)),
-            "mfcc_var": float(round(mfcc_var, 6)),
-            "avg_rms": float(round(avg_rms, 6)),
-            "spectral_centroid_std": float(round(cent_std, 3))
-        }
+        return _score(pitch_std, pitch_mean, jitter, shimmer, mfcc_var, avg_rms, cent_std)
     except Exception as e:
         return {"error": str(e)}
+
+
+def _score(pitch_std, pitch_mean, jitter, shimmer, mfcc_var, avg_rms, cent_std):
+    # --- Heuristic scoring (tweak weights experimentally)
+    # Higher pitch_std, jitter, shimmer, mfcc_var => higher stress
+    score = (pitch_std / 50.0) + (jitter * 5.0) + (shimmer * 5.0) + (mfcc_var * 0.1)
+    score = float(round(score, 3))
+
+    if score < 0.5:
+        level = "Low Stress"
+    elif score < 1.2:
+        level = "Moderate Stress"
+    else:
+        level = "High Stress"
+
+    return {
+        "stress_score": score,
+        "stress_level": level,
+        "pitch_std": float(round(pitch_std, 3)),
+        "pitch_mean": float(round(pitch_mean, 3)),
+        "jitter": float(round(jitter, 6)),
+        "shimmer": float(round(shimmer, 6)),
+        "mfcc_var": float(round(mfcc_var, 6)),
+        "avg_rms": float(round(avg_rms, 6)),
+        "spectral_centroid_std": float(round(cent_std, 3))
+    }
+
+
+def _analyze_stress_stream(wav_path: str, tracks: dict = None, block_seconds: float = None):
+    """
+    Same features as analyze_stress, computed over librosa.stream blocks so
+    peak memory does not grow with the recording. Blocks overlap by one
+    frame, so framing is continuous (center=False); statistics are merged
+    with RunningStats and the last voiced F0 is carried across blocks for
+    jitter. Per-block pyin decoding makes F0 differ slightly at block edges.
+    """
+    sr = librosa.get_samplerate(wav_path)
+    block_length = max(int((block_seconds or BLOCK_SECONDS) * sr / HOP_LENGTH), 1)
+    rms_stats, f0_stats, cent_stats, mfcc_stats = RunningStats(), RunningStats(), RunningStats(), RunningStats()
+    jitter_sum, jitter_count, last_f0 = 0.0, 0, None
+    collected = {"rms": [], "spectral_centroid": [], "mfcc": [], "f0": []} if tracks is not None else None
+    frame_args = dict(n_fft=FRAME_LENGTH, hop_length=HOP_LENGTH, center=False)
+
+    for block in librosa.stream(wav_path, block_length=block_length, frame_length=FRAME_LENGTH,
+                                hop_length=HOP_LENGTH, mono=True, dtype=np.float32):
+        if len(block) < FRAME_LENGTH:
+            continue
+        rms = librosa.feature.rms(y=block, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH, center=False)[0]
+        cent = librosa.feature.spectral_centroid(y=block, sr=sr, **frame_args)[0]
+        mfcc = librosa.feature.mfcc(y=block, sr=sr, n_mfcc=13, **frame_args)
+        try:
+            f0, _, _ = librosa.pyin(block, fmin=50, fmax=400, sr=sr, frame_length=FRAME_LENGTH,
+                                    hop_length=HOP_LENGTH, center=False)
+        except Exception:
+            f0 = np.full(rms.shape, np.nan)
+
+        rms_stats.update(rms)
+        cent_stats.update(cent)
+        mfcc_stats.update(mfcc.T)
+        voiced = f0[~np.isnan(f0)]
+        f0_stats.update(voiced)
+        if voiced.size:
+            chain = voiced if last_f0 is None else np.concatenate([[last_f0], voiced])
+            jitter_sum += float(np.abs(np.diff(chain)).sum())
+            jitter_count += chain.size - 1
+            last_f0 = voiced[-1]
+        if collected is not None:
+            for name, values in (("rms", rms), ("spectral_centroid", cent), ("mfcc", mfcc.T), ("f0", f0)):
+                collected[name].append(values.astype(np.float32))
+
+    avg_rms = float(rms_stats.mean) if rms_stats.count else 0.0
+    pitch_mean = float(f0_stats.mean) if f0_stats.count else 0.0
+    pitch_std = float(f0_stats.std) if f0_stats.count else 0.0
+    jitter = float((jitter_sum / jitter_count) / (pitch_mean + 1e-9)) if jitter_count else 0.0
+    shimmer = float(rms_stats.std / (avg_rms + 1e-9)) if rms_stats.count else 0.0
+    cent_std = float(cent_stats.std) if cent_stats.count else 0.0
+    mfcc_var = float(np.mean(mfcc_stats.var)) if mfcc_stats.count else 0.0
+
+    if collected is not None:
+        frame_rate = sr / HOP_LENGTH
+        for name, chunks in collected.items():
+            if chunks:
+                tracks[name] = (np.concatenate(chunks), frame_rate)
+
+    return _score(pitch_std, pitch_mean, jitter, shimmer, mfcc_var, avg_rms, cent_std)
@@ -0,0 +1,175 @@
+# analysis_profiles.py
+"""
+Named analysis profiles trading accuracy for latency.
+
+    fast      basic energy/ZCR analyzers, whisper tiny, greedy decoding
+              (single temperature, no conditioning on previous text), no
+              denoise
+    balanced  basic analyzers, WHISPER_MODEL (base), default decoding,
+              SNR-gated denoise - the long-standing default
+    accurate  app/services/analysis stack (pydub silence, pyin/MFCC stress,
+              fuzzy filler matching), whisper small, beam search with
+              temperature fallback
+
+Every profile decodes with a fixed language (ANALYSIS_LANGUAGE, skipping
+Whisper's detection pass) and fp32, which is what CPUs run.
+
+A request names a profile or gives a latency budget; with a budget the most
+accurate profile whose predicted cost fits is used, else `fast`. Cost is
+predicted per audio second from an EWMA of measured runs, seeded with
+ANALYSIS_PROFILE_PRIORS until a profile has run.
+"""
+import os
+import threading
+
+from app.services import asr, metrics
+
+ANALYSIS_PROFILE = os.getenv("ANALYSIS_PROFILE", "balanced")
+ANALYSIS_LANGUAGE = os.getenv("ANALYSIS_LANGUAGE", "en")
+COST_EWMA_ALPHA = float(os.getenv("ANALYSIS_PROFILE_EWMA_ALPHA", "0.2"))
+# Seconds of analysis per second of audio before anything is measured (CPU, 4 workers)
+ANALYSIS_PROFILE_PRIORS = os.getenv("ANALYSIS_PROFILE_PRIORS", "fast=0.08,balanced=0.2,accurate=0.9")
+
+PROFILE_SECONDS = metrics.Histogram(
+    "virtuhire_analysis_profile_seconds", "Analysis time (preprocess + analyzers) per profile", ("profile",))
+PROFILE_SELECTIONS = metrics.Counter(
+    "virtuhire_analysis_profile_selections", "Analyses run per profile and how it was chosen", ("profile", "reason"))
+
+
+class UnknownProfile(ValueError):
+    pass
+
+
+class Profile:
+    def __init__(self, name: str, description: str, analyzers: dict, whisper_model: str,
+                 decode_options: dict, denoise: bool):
+        """
+        Args:
+            analyzers: result slot (pause/filler/stress) -> pipeline node name
+            whisper_model: model name passed to asr.transcribe
+            decode_options: whisper decode options for the transcript node
+            denoise: whether preprocessing may denoise (still SNR-gated)
+        """
+        self.name = name
+        self.description = description
+        self.analyzers = dict(analyzers)
+        self.whisper_model = whisper_model
+        self.decode_options = dict(decode_options)
+        self.denoise = denoise
+
+    def targets(self) -> list:
+        return list(self.analyzers.values())
+
+    def slot(self, node_name: str) -> str:
+        """Result slot a pipeline node fills for this profile (node name if none)."""
+        for slot, node in self.analyzers.items():
+            if node == node_name:
+                return slot
+        return node_name
+
+    def asr_options(self) -> dict:
+        return {"model_name": self.whisper_model, "language": ANALYSIS_LANGUAGE, "fp16": False,
+                **self.decode_options}
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "analyzers": self.analyzers,
+            "whisper_model": self.whisper_model,
+            "decode_options": self.asr_options(),
+            "denoise": self.denoise,
+        }
+
+
+BASIC = {"pause": "pause", "filler": "filler", "stress": "stress"}
+DETAILED = {"pause": "pause_silence", "filler": "filler_fuzzy", "stress": "stress_spectral"}
+
+# Least to most accurate; budget selection walks this backwards
+PROFILES = {
+    "fast": Profile(
+        "fast", "Lowest latency: basic analyzers, whisper tiny, greedy decoding",
+        BASIC, "tiny", {"temperature": 0.0, "condition_on_previous_text": False}, denoise=False),
+    "balanced": Profile(
+        "balanced", "Default: basic analyzers, default whisper model and decoding",
+        BASIC, asr.WHISPER_MODEL, {}, denoise=True),
+    "accurate": Profile(
+        "accurate", "Best quality: pitch/MFCC stress, fuzzy fillers, whisper small with beam search",
+        DETAILED, "small",
+        {"beam_size": 5, "best_of": 5, "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)}, denoise=True),
+}
+
+
+# -------------------
+# Measured cost
+# -------------------
+def _parse_priors(spec: str) -> dict:
+    priors = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() in PROFILES and value:
+            priors[name.strip()] = float(value)
+    return priors
+
+
+_lock = threading.Lock()
+_priors = _parse_priors(ANALYSIS_PROFILE_PRIORS)
+_costs = {name: {"seconds_per_audio_second": _priors.get(name, 1.0), "runs": 0, "last_seconds": None}
+          for name in PROFILES}
+
+
+def get(name: str) -> Profile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise UnknownProfile(f"Unknown analysis profile {name!r}; choose one of {sorted(PROFILES)}") from None
+
+
+def predict_seconds(name: str, audio_seconds: float) -> float:
+    with _lock:
+        return _costs[name]["seconds_per_audio_second"] * max(audio_seconds, 0.0)
+
+
+def choose(name: str = None, budget_ms: float = None, audio_seconds: float = 0.0):
+    """
+    Returns (profile, reason). An explicit name wins; otherwise with a budget
+    the most accurate profile predicted to finish within it, falling back to
+    the fastest; otherwise ANALYSIS_PROFILE.
+    """
+    if name:
+        profile, reason = get(name), "requested"
+    elif budget_ms is not None:
+        order = list(PROFILES)
+        profile, reason = PROFILES[order[0]], "budget_exceeded"
+        for candidate in reversed(order):
+            if predict_seconds(candidate, audio_seconds) * 1000 <= budget_ms:
+                profile, reason = PROFILES[candidate], "budget"
+                break
+    else:
+        profile, reason = get(ANALYSIS_PROFILE), "default"
+    PROFILE_SELECTIONS.inc(profile=profile.name, reason=reason)
+    return profile, reason
+
+
+def record(name: str, seconds: float, audio_seconds: float):
+    """Fold one measured run into the profile's cost estimate."""
+    PROFILE_SECONDS.observe(seconds, profile=name)
+    if audio_seconds <= 0:
+        return
+    rate = seconds / audio_seconds
+    with _lock:
+        cost = _costs[name]
+        if cost["runs"] == 0:
+            cost["seconds_per_audio_second"] = rate
+        else:
+            cost["seconds_per_audio_second"] += COST_EWMA_ALPHA * (rate - cost["seconds_per_audio_second"])
+        cost["runs"] += 1
+        cost["last_seconds"] = seconds
+
+
+def report() -> list:
+    """Every profile's settings plus its current cost estimate."""
+    with _lock:
+        costs = {name: dict(cost) for name, cost in _costs.items()}
+    return [{**profile.describe(), "default": name == ANALYSIS_PROFILE, "cost": costs[name]}
+            for name, profile in PROFILES.items()]
@@ -0,0 +1,218 @@
+# asr.py
+"""
+Speech-to-text entry point for the API workers.
+
+If a local model server (see backend/model_server.py) is listening on
+MODEL_SERVER_SOCKET, transcription is delegated to it over a Unix domain
+socket so the Whisper weights live in memory once per node. Otherwise the
+model is loaded lazily in-process, once per worker, and reused.
+
+With ASR_MAX_BATCH > 1, in-process requests go through a micro-batching
+scheduler (app/services/asr_batching.py) that decodes concurrent short
+requests together; ASR_MAX_WAIT_MS bounds the extra queueing latency.
+"""
+import json
+import os
+import socket
+import struct
+import threading
+
+import numpy as np
+
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "/tmp/virtuhire-asr.sock")
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "300"))
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+SAMPLE_RATE = 16000  # whisper expects 16 kHz mono float32
+ASR_MAX_BATCH = int(os.getenv("ASR_MAX_BATCH", "1"))
+ASR_MAX_WAIT_MS = float(os.getenv("ASR_MAX_WAIT_MS", "10"))
+# Recordings longer than this are transcribed in chunks cut at the quietest point
+# near each boundary, so an analysis can be cancelled between them
+ASR_CHUNK_SECONDS = float(os.getenv("ASR_CHUNK_SECONDS", "120"))
+ASR_CUT_SEARCH_SECONDS = 2.0
+
+_local_models = {}
+_batchers = {}
+_local_lock = threading.Lock()  # whisper's kv-cache hooks are not re-entrant
+
+
+class ModelServerUnavailable(Exception):
+    pass
+
+
+# -------------------
+# Wire protocol: 4-byte big-endian length + JSON header, then raw payload
+# -------------------
+def send_message(sock, header: dict, payload: bytes = b""):
+    header = dict(header, n_bytes=len(payload))
+    data = json.dumps(header).encode()
+    sock.sendall(struct.pack(">I", len(data)) + data + payload)
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(min(n - len(buf), 1 << 20))
+        if not chunk:
+            raise ConnectionError("socket closed mid-message")
+        buf += chunk
+    return bytes(buf)
+
+
+def recv_message(sock):
+    (length,) = struct.unpack(">I", _recv_exact(sock, 4))
+    header = json.loads(_recv_exact(sock, length))
+    payload = _recv_exact(sock, header.get("n_bytes", 0))
+    return header, payload
+
+
+def encode_audio(audio):
+    """Return (header fields, payload) for a file path or 16 kHz float32 array."""
+    if isinstance(audio, str):
+        return {"kind": "path", "path": os.path.abspath(audio)}, b""
+    arr = np.ascontiguousarray(audio, dtype="<f4")
+    return {"kind": "pcm_f32le", "sample_rate": SAMPLE_RATE}, arr.tobytes()
+
+
+def decode_audio(header: dict, payload: bytes):
+    if header["kind"] == "path":
+        return header["path"]
+    return np.frombuffer(payload, dtype="<f4")
+
+
+# -------------------
+# Client side
+# -------------------
+def _transcribe_remote(audio, model_name: str, options: dict) -> dict:
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    except (AttributeError, OSError) as e:  # no AF_UNIX (e.g. older Windows)
+        raise ModelServerUnavailable(str(e))
+    try:
+        try:
+            sock.connect(MODEL_SERVER_SOCKET)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ModelServerUnavailable(str(e))
+        sock.settimeout(MODEL_SERVER_TIMEOUT)
+        fields, payload = encode_audio(audio)
+        send_message(sock, dict(fields, op="transcribe", model=model_name, options=options), payload)
+        header, _ = recv_message(sock)
+    finally:
+        sock.close()
+    if not header.get("ok"):
+        raise RuntimeError(f"model server error: {header.get('error')}")
+    return header["result"]
+
+
+def load_local_model(model_name: str = None):
+    """Load (once) and return an in-process whisper model."""
+    model_name = model_name or WHISPER_MODEL
+    model = _local_models.get(model_name)
+    if model is None:
+        with _local_lock:
+            model = _local_models.get(model_name)
+            if model is None:
+                import whisper
+                model = _local_models[model_name] = whisper.load_model(model_name)
+    return model
+
+
+def get_batcher(model_name: str = None):
+    """Per-model micro-batching scheduler owning the in-process model."""
+    from app.services.asr_batching import BatchingTranscriber
+    model_name = model_name or WHISPER_MODEL
+    with _local_lock:
+        if model_name not in _batchers or _batchers[model_name].failed:
+            _batchers[model_name] = BatchingTranscriber(
+                lambda: load_local_model(model_name),
+                max_batch=ASR_MAX_BATCH,
+                max_wait_ms=ASR_MAX_WAIT_MS,
+            )
+        return _batchers[model_name]
+
+
+def server_available() -> bool:
+    return os.path.exists(MODEL_SERVER_SOCKET)
+
+
+def transcribe(audio, model_name: str = None, **options) -> dict:
+    """
+    Transcribe a file path or a 16 kHz mono float32 array.
+    Returns the whisper result dict ({"text", "segments", "language"}).
+    """
+    model_name = model_name or WHISPER_MODEL
+    options.setdefault("fp16", False)  # CPU inference; avoids the fp16 warning
+    if server_available():
+        try:
+            return _transcribe_remote(audio, model_name, options)
+        except ModelServerUnavailable:
+            pass  # stale socket file; fall back to in-process
+    if ASR_MAX_BATCH > 1:
+        return get_batcher(model_name).transcribe(audio, **options)
+    model = load_local_model(model_name)
+    with _local_lock:
+        return model.transcribe(audio, **options)
+
+
+def transcribe_samples(y, sr: int, model_name: str = None, cancel=None, **options) -> dict:
+    """
+    transcribe() for an in-memory buffer at any rate (downmixed/resampled to 16 kHz).
+    Recordings longer than ASR_CHUNK_SECONDS are transcribed in chunks
+    (transcribe_chunked) whether or not `cancel` is given, so every caller
+    gets the same transcript for the same audio; `cancel`
+    (cancellation.CancelToken) is checked before each chunk.
+    """
+    audio = np.asarray(y, dtype=np.float32)
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1, dtype=np.float32)
+    if sr != SAMPLE_RATE:
+        import librosa
+        audio = librosa.resample(audio, orig_sr=sr, target_sr=SAMPLE_RATE)
+    return transcribe_chunked(audio, lambda chunk, **o: transcribe(chunk, model_name, **o),
+                              cancel=cancel, **options)
+
+
+def transcribe_chunked(audio, transcribe_chunk, cancel=None, chunk_seconds: float = None, **options) -> dict:
+    """
+    Transcribe 16 kHz `audio` with `transcribe_chunk(samples, **options)`, in
+    chunks of about `chunk_seconds` (default ASR_CHUNK_SECONDS). Later chunks
+    are decoded in the first chunk's language and, when conditioning on
+    previous text, prompted with the text so far; segment timestamps are
+    shifted back onto the whole recording.
+    """
+    if cancel is not None:
+        cancel.check("transcript")
+    bounds = _chunk_bounds(audio, int((chunk_seconds or ASR_CHUNK_SECONDS) * SAMPLE_RATE))
+    if len(bounds) == 2:
+        return transcribe_chunk(audio, **options)
+
+    texts, segments, language = [], [], None
+    for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if i and cancel is not None:
+            cancel.check("transcript")
+        chunk_options = dict(options)
+        if language is not None:
+            chunk_options.setdefault("language", language)  # don't re-detect per chunk
+        if texts and chunk_options.get("condition_on_previous_text", True):
+            chunk_options.setdefault("initial_prompt", " ".join(texts)[-200:])  # carry context across the cut
+        result = transcribe_chunk(audio[start:end], **chunk_options)
+        offset = start / SAMPLE_RATE
+        texts.append(result.get("text", "").strip())
+        for segment in result.get("segments", []):
+            segments.append({**segment, "start": segment["start"] + offset, "end": segment["end"] + offset})
+        language = language or result.get("language")
+    return {"text": " ".join(t for t in texts if t), "segments": segments, "language": language}
+
+
+def _chunk_bounds(audio, chunk_samples: int) -> list:
+    """Sample offsets [0, ..., len(audio)], cut at the quietest 20 ms near every chunk_samples."""
+    from app.services.analysis.audio_io import frame_rms
+
+    search = min(int(ASR_CUT_SEARCH_SECONDS * SAMPLE_RATE), chunk_samples // 4)  # every chunk advances
+    bounds = [0]
+    while len(audio) - bounds[-1] > chunk_samples + search:
+        target = bounds[-1] + chunk_samples
+        lo, hi = target - search, target + search
+        rms, hop = frame_rms(audio[lo:hi], SAMPLE_RATE)
+        bounds.append(lo + int(np.argmin(rms)) * hop if rms.size else target)
+    bounds.append(len(audio))
+    return bounds
@@ -0,0 +1,258 @@
+# asr_batching.py
+"""
+Dynamic micro-batching in front of a Whisper model.
+
+Concurrent transcription requests are collected for up to `max_wait_ms`
+(or until `max_batch` are queued), their log-mel windows are padded and
+stacked, and the encoder + decoder run once for the whole batch. Results
+are routed back through per-request futures.
+
+Only single-window requests (<= 30 s) with plain decoding options are
+batched. Longer audio, or options such as initial_prompt/word_timestamps,
+goes through model.transcribe() unchanged. A batched item that would have
+triggered whisper's temperature fallback is re-run through
+model.transcribe() as well, so the output matches the unbatched path.
+
+If no worker manages to load the model, everything queued fails with
+BatcherFailed and so does every later submit(); callers replace a failed
+batcher (asr.get_batcher, ModelServer.pool) to retry the load.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as ResultTimeout
+
+import numpy as np
+
+# Decoding options that can be shared by every item in a batch
+BATCHABLE_OPTIONS = {"language", "task", "fp16", "beam_size", "best_of", "patience", "temperature"}
+
+# whisper.transcribe() defaults used to decide when to fall back
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# Longest transcribe() waits for its result before giving up on it
+ASR_RESULT_TIMEOUT = float(os.getenv("ASR_RESULT_TIMEOUT", "300"))
+
+
+class BatcherFailed(RuntimeError):
+    pass
+
+
+class _Request:
+    __slots__ = ("audio", "options", "future", "enqueued")
+
+    def __init__(self, audio, options):
+        self.audio = audio
+        self.options = options
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+def _batch_key(options: dict):
+    """Hashable key for options, or None if the request cannot be batched."""
+    if set(options) - BATCHABLE_OPTIONS:
+        return None
+    key = []
+    for name, value in sorted(options.items()):
+        if isinstance(value, list):
+            value = tuple(value)
+        key.append((name, value))
+    return tuple(key)
+
+
+class BatchingTranscriber:
+    def __init__(self, load_model, max_batch: int = 8, max_wait_ms: float = 10.0, workers: int = 1):
+        """
+        Args:
+            load_model: zero-arg callable returning a whisper model; called once
+                per worker so each worker thread owns its replica
+            max_batch: upper bound on requests decoded together
+            max_wait_ms: how long the first queued request waits for company
+            workers: worker threads (model replicas) draining the shared queue
+        """
+        self.max_batch = max(int(max_batch), 1)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        self._queue = queue.Queue()
+        self._load_model = load_model
+        self.stats = {"batches": 0, "batched_items": 0, "unbatched_items": 0, "fallbacks": 0}
+        self.error = None  # set once every worker has failed to load the model
+        self._lock = threading.Lock()
+        self._alive = max(int(workers), 1)
+        self._threads = []
+        for i in range(max(int(workers), 1)):
+            t = threading.Thread(target=self._worker, name=f"asr-batcher-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    # -------------------
+    # Public API
+    # -------------------
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def submit(self, audio, **options) -> Future:
+        request = _Request(audio, options)
+        with self._lock:
+            if self.error is not None:
+                raise BatcherFailed(f"ASR model failed to load: {self.error}") from self.error
+            self._queue.put(request)
+        return request.future
+
+    def transcribe(self, audio, timeout: float = ASR_RESULT_TIMEOUT, **options) -> dict:
+        """submit() and wait; a request still queued when `timeout` expires is withdrawn."""
+        future = self.submit(audio, **options)
+        try:
+            return future.result(timeout)
+        except ResultTimeout:
+            future.cancel()  # only succeeds if no worker has picked it up yet
+            raise
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def close(self):
+        """Stop the worker threads once the queued requests are drained."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+
+    # -------------------
+    # Worker
+    # -------------------
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:  # shutdown sentinel: finish this batch first
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _load_failed(self, error: Exception):
+        """A worker couldn't load its model; the last one to fail fails the queue."""
+        with self._lock:
+            self._alive -= 1
+            if self._alive > 0:
+                return
+            self.error = error
+        print(f"ASR batcher has no model ({error}); failing queued requests")
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if request is not None and request.future.set_running_or_notify_cancel():
+                request.future.set_exception(BatcherFailed(f"ASR model failed to load: {error}"))
+
+    def _worker(self):
+        try:
+            import whisper
+            model = self._load_model()
+        except Exception as e:
+            self._load_failed(e)
+            return
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            groups = {}
+            for request in batch:
+                if not request.future.set_running_or_notify_cancel():
+                    continue  # withdrawn by a caller that timed out
+                try:
+                    if isinstance(request.audio, str):
+                        request.audio = whisper.load_audio(request.audio)
+                    key = _batch_key(request.options)
+                    if key is None or len(request.audio) > whisper.audio.N_SAMPLES:
+                        self._run_single(model, request)
+                    else:
+                        groups.setdefault(key, []).append(request)
+                except Exception as e:
+                    request.future.set_exception(e)
+            for group in groups.values():
+                try:
+                    self._run_batch(model, group)
+                except Exception as e:
+                    for request in group:
+                        if not request.future.done():
+                            request.future.set_exception(e)
+
+    def _count(self, **increments):
+        with self._lock:  # workers share the counters
+            for name, n in increments.items():
+                self.stats[name] += n
+
+    def _run_single(self, model, request):
+        self._count(unbatched_items=1)
+        request.future.set_result(model.transcribe(request.audio, **request.options))
+
+    def _run_batch(self, model, group):
+        import torch
+        import whisper
+        from whisper.audio import N_FRAMES, N_SAMPLES, SAMPLE_RATE
+
+        # Same first-window features as whisper.transcribe(): content frames
+        # of a padded log-mel, then zero-padded out to the 30 s window
+        mels = []
+        for request in group:
+            audio = torch.from_numpy(np.asarray(request.audio, dtype=np.float32))
+            mel = whisper.log_mel_spectrogram(audio, model.dims.n_mels, padding=N_SAMPLES)
+            content_frames = mel.shape[-1] - N_FRAMES
+            mels.append(whisper.pad_or_trim(mel[:, :content_frames], N_FRAMES))
+        mel_batch = torch.stack(mels).to(model.device)
+
+        options = dict(group[0].options)
+        temperature = options.pop("temperature", 0.0)
+        if isinstance(temperature, (list, tuple)):
+            temperature = temperature[0]
+        if temperature > 0:
+            options.pop("beam_size", None)
+            options.pop("patience", None)
+        else:
+            options.pop("best_of", None)
+        decode_options = whisper.DecodingOptions(temperature=temperature, **options)
+        with torch.no_grad():
+            results = whisper.decode(model, mel_batch, decode_options)
+
+        self._count(batches=1, batched_items=len(group))
+        for request, result in zip(group, results):
+            silent = (result.no_speech_prob > NO_SPEECH_THRESHOLD
+                      and result.avg_logprob < LOGPROB_THRESHOLD)
+            needs_fallback = (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                              or result.avg_logprob < LOGPROB_THRESHOLD)
+            if needs_fallback and not silent:
+                self._count(fallbacks=1)
+                self._run_single(model, request)
+                continue
+            text = "" if silent else result.text
+            duration = len(request.audio) / SAMPLE_RATE
+            request.future.set_result({
+                "text": text,
+                "segments": [] if silent else [{
+                    "id": 0,
+                    "seek": 0,
+                    "start": 0.0,
+                    "end": round(duration, 3),
+                    "text": text,
+                    "tokens": result.tokens,
+                    "temperature": result.temperature,
+                    "avg_logprob": result.avg_logprob,
+                    "compression_ratio": result.compression_ratio,
+                    "no_speech_prob": result.no_speech_prob,
+                }],
+                "language": result.language,
+            })
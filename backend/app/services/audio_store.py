@@ -0,0 +1,258 @@
+# audio_store.py
+"""
+Optional content-addressed store for analyzed audio (enable with AUDIO_STORE_DIR).
+
+Every stored recording is keyed by the SHA-256 of its decoded 16-bit PCM,
+so re-uploads of the same audio share one object. Each object has:
+
+    objects/ab/<hash>.flac   lossless copy at the original sample rate
+    objects/ab/<hash>.f32    raw little-endian float32, mono, 16 kHz; the
+                             analyzers' input, opened with np.memmap so
+                             re-analysis needs no decoding or resampling
+    refs/<file_id>           the hash an AudioAnalysis.file_id points to
+                             (written after the analysis row is committed)
+
+The store is bounded by AUDIO_STORE_MAX_BYTES. Each process keeps a running
+byte total (one directory scan on first write, then the sizes of the files
+it adds), and only scans again to evict once that total passes the cap.
+Eviction is least recently used per object (reads bump the mtime) and
+removes whole objects, FLAC and cache together, until the store is back
+under AUDIO_STORE_LOW_WATER of the cap, then drops the refs that pointed
+to evicted objects. With several workers each one only
+counts its own writes between evictions, so the store can overshoot by what
+the others wrote in the meantime.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+import soundfile as sf
+
+AUDIO_STORE_DIR = os.getenv("AUDIO_STORE_DIR", "")
+AUDIO_STORE_MAX_BYTES = int(os.getenv("AUDIO_STORE_MAX_BYTES", str(5 * 1024 ** 3)))
+AUDIO_STORE_LOW_WATER = float(os.getenv("AUDIO_STORE_LOW_WATER", "0.9"))  # evict down to this fraction
+CACHE_SAMPLE_RATE = 16000
+
+_usage_bytes = None  # running total for this process; None until the first scan
+_usage_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return bool(AUDIO_STORE_DIR)
+
+
+def _object_path(content_hash: str, ext: str) -> str:
+    return os.path.join(AUDIO_STORE_DIR, "objects", content_hash[:2], f"{content_hash}{ext}")
+
+
+def _ref_path(file_id: str) -> str:
+    return os.path.join(AUDIO_STORE_DIR, "refs", os.path.basename(file_id))
+
+
+def _write_atomic(path: str, write):
+    """Write via a temp file in the same directory so readers never see partial files."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_text(path: str, text: str):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def _to_pcm16(samples: np.ndarray) -> np.ndarray:
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+
+
+def to_cache_rate(samples: np.ndarray, sr: int) -> np.ndarray:
+    """Resample mono float32 samples to the cache rate (16 kHz)."""
+    if sr == CACHE_SAMPLE_RATE:
+        return np.asarray(samples, dtype=np.float32)
+    import librosa
+    return librosa.resample(np.asarray(samples, dtype=np.float32), orig_sr=sr, target_sr=CACHE_SAMPLE_RATE)
+
+
+def _write_cache(content_hash: str, y16: np.ndarray) -> int:
+    data = np.ascontiguousarray(y16, dtype="<f4")
+    _write_atomic(_object_path(content_hash, ".f32"), lambda tmp: data.tofile(tmp))
+    return data.nbytes
+
+
+def put(file_id: str, samples: np.ndarray, sr: int, y16: np.ndarray = None) -> str:
+    """
+    Store mono float32 `samples` (at `sr`) for `file_id` and return the
+    content hash. Pass `y16` if the 16 kHz resample already exists.
+    """
+    pcm = _to_pcm16(samples)
+    digest = hashlib.sha256(pcm.tobytes())
+    digest.update(str(sr).encode())
+    content_hash = digest.hexdigest()
+
+    added = 0
+    flac_path = _object_path(content_hash, ".flac")
+    if not os.path.exists(flac_path):
+        _write_atomic(flac_path, lambda tmp: sf.write(tmp, pcm, sr, format="FLAC", subtype="PCM_16"))
+        added += os.path.getsize(flac_path)
+    if not os.path.exists(_object_path(content_hash, ".f32")):
+        added += _write_cache(content_hash, to_cache_rate(samples, sr) if y16 is None else y16)
+    _touch(content_hash)
+    _write_atomic(_ref_path(file_id), lambda tmp: _write_text(tmp, content_hash))
+    _account(added)
+    return content_hash
+
+
+def lookup(file_id: str):
+    """Content hash stored for file_id, or None."""
+    try:
+        with open(_ref_path(file_id)) as f:
+            content_hash = f.read().strip()
+    except OSError:
+        return None
+    return content_hash if os.path.exists(_object_path(content_hash, ".flac")) else None
+
+
+def cache_path(file_id: str):
+    """Path of the 16 kHz float32 cache for file_id (rebuilt from FLAC if evicted), or None."""
+    if not enabled():
+        return None
+    content_hash = lookup(file_id)
+    if content_hash is None:
+        return None
+    path = _object_path(content_hash, ".f32")
+    if not os.path.exists(path):
+        samples, sr = sf.read(_object_path(content_hash, ".flac"), dtype="float32")
+        _account(_write_cache(content_hash, to_cache_rate(samples, sr)))
+    _touch(content_hash)
+    return path
+
+
+def load(path: str):
+    """Memory-map a .f32 cache file: returns (read-only float32 array, 16000)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.float32), CACHE_SAMPLE_RATE
+    return np.memmap(path, dtype="<f4", mode="r"), CACHE_SAMPLE_RATE
+
+
+def open_audio(file_id: str):
+    """(memory-mapped 16 kHz samples, 16000) for file_id, or None if not stored."""
+    path = cache_path(file_id)
+    return load(path) if path else None
+
+
+# -------------------
+# LRU eviction
+# -------------------
+def _touch(content_hash: str):
+    for ext in (".flac", ".f32"):
+        try:
+            os.utime(_object_path(content_hash, ext))
+        except OSError:
+            pass
+
+
+def _entries():
+    """{content hash: [last use, bytes, [paths]]} for every object in the store."""
+    root = os.path.join(AUDIO_STORE_DIR, "objects")
+    if not os.path.isdir(root):
+        return {}
+    entries = {}
+    for shard in os.scandir(root):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            content_hash, ext = os.path.splitext(entry.name)
+            if ext not in (".flac", ".f32"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            obj = entries.setdefault(content_hash, [0.0, 0, []])
+            obj[0] = max(obj[0], st.st_mtime)
+            obj[1] += st.st_size
+            obj[2].append(entry.path)
+    return entries
+
+
+def _account(added: int):
+    """Add newly written bytes to the running total and evict if it passed the cap."""
+    global _usage_bytes
+    with _usage_lock:
+        if _usage_bytes is None:
+            _usage_bytes = sum(size for _, size, _ in _entries().values())  # includes `added`
+        else:
+            _usage_bytes += added
+        over = _usage_bytes > AUDIO_STORE_MAX_BYTES
+    if over:
+        evict()
+
+
+def evict(max_bytes: int = None) -> int:
+    """
+    Delete least recently used objects until the store is under the low-water
+    mark of `max_bytes`; returns bytes freed and resyncs the running total.
+    """
+    global _usage_bytes
+    max_bytes = AUDIO_STORE_MAX_BYTES if max_bytes is None else max_bytes
+    target = max_bytes * AUDIO_STORE_LOW_WATER
+    with _usage_lock:
+        entries = _entries()
+        total = sum(size for _, size, _ in entries.values())
+        freed = 0
+        for _, size, paths in sorted(entries.values()):
+            if total - freed <= target:
+                break
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            freed += size
+        _usage_bytes = total - freed
+    if freed:
+        prune_refs()
+    return freed
+
+
+def prune_refs() -> int:
+    """Delete refs whose object is gone (evicted, or removed by hand); returns how many."""
+    root = os.path.join(AUDIO_STORE_DIR, "refs")
+    if not os.path.isdir(root):
+        return 0
+    pruned = 0
+    for entry in os.scandir(root):
+        if entry.name.endswith(".part"):
+            continue  # put() still writing it
+        try:
+            with open(entry.path) as f:
+                content_hash = f.read().strip()
+        except OSError:
+            continue
+        # put() writes the object before the ref, so a live ref's object always exists
+        if not os.path.exists(_object_path(content_hash, ".flac")):
+            try:
+                os.remove(entry.path)
+                pruned += 1
+            except FileNotFoundError:
+                pass
+    return pruned
+
+
+def usage() -> dict:
+    entries = _entries()
+    paths = [path for _, _, object_paths in entries.values() for path in object_paths]
+    return {
+        "bytes": sum(size for _, size, _ in entries.values()),
+        "max_bytes": AUDIO_STORE_MAX_BYTES,
+        "objects": sum(1 for path in paths if path.endswith(".flac")),
+        "caches": sum(1 for path in paths if path.endswith(".f32")),
+    }
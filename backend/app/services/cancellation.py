@@ -0,0 +1,74 @@
+# cancellation.py
+"""
+Cooperative cancellation for in-flight analyses.
+
+Each analysis carries a CancelToken. It is cancelled when the client
+disconnects (watch_disconnect, or the SSE stream closing) or when the
+request's deadline passes (ANALYSIS_DEADLINE_SECONDS after it arrived).
+Running code can't be interrupted, so the analysis checks the token at
+safe points: between stages, before each pipeline node is started, and
+between ASR chunks of long recordings. check() raises Cancelled there, and
+the work that hasn't started yet is dropped.
+"""
+import asyncio
+import os
+import threading
+import time
+
+from app.services import metrics
+
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "600"))
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+CANCELLED = metrics.Counter(
+    "virtuhire_analyses_cancelled", "Analyses abandoned before completion", ("reason", "stage"))
+CANCELLED_SECONDS = metrics.Histogram(
+    "virtuhire_analysis_cancelled_work_seconds", "Time spent on analyses that were then cancelled", ("reason",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+
+
+class Cancelled(Exception):
+    def __init__(self, reason: str, stage: str = None):
+        super().__init__(f"Analysis cancelled ({reason})" + (f" before {stage}" if stage else ""))
+        self.reason = reason
+        self.stage = stage
+
+
+class CancelToken:
+    def __init__(self, deadline_seconds: float = ANALYSIS_DEADLINE_SECONDS):
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline_seconds if deadline_seconds and deadline_seconds > 0 else None
+        self.reason = None
+        self._recorded = False
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str):
+        with self._lock:
+            if self.reason is None:
+                self.reason = reason
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is None and self.deadline is not None and time.monotonic() > self.deadline:
+            self.cancel("deadline")
+        return self.reason is not None
+
+    def check(self, stage: str = None):
+        """Raise Cancelled (counted once per token) if the analysis should stop before `stage`."""
+        if not self.cancelled:
+            return
+        with self._lock:
+            first, self._recorded = not self._recorded, True
+        if first:
+            CANCELLED.inc(reason=self.reason, stage=stage or "unknown")
+            CANCELLED_SECONDS.observe(time.monotonic() - self.started, reason=self.reason)
+        raise Cancelled(self.reason, stage)
+
+
+async def watch_disconnect(request, token: CancelToken, interval: float = DISCONNECT_POLL_SECONDS):
+    """Cancel `token` once the client has gone away; run as a task next to the analysis."""
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel("client_disconnect")
+            return
+        await asyncio.sleep(interval)
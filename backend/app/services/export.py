@@ -0,0 +1,83 @@
+# export.py
+"""
+Streaming NDJSON export of AudioAnalysis rows.
+
+Rows are paged out of the database with yield_per (a server-side cursor
+on MySQL, incremental fetches on SQLite) as plain column tuples, encoded
+one JSON object per line and sent in chunks of EXPORT_CHUNK_ROWS, so
+memory stays flat however many rows are exported and the first bytes go
+out as soon as the first page is read. Optional gzip output is flushed
+per chunk so it streams too.
+"""
+import json
+import os
+import zlib
+
+from fastapi.responses import StreamingResponse
+
+import models
+from database import SessionLocal
+
+try:
+    import orjson
+except ImportError:  # optional: ~5-10x faster encoding; stdlib json otherwise
+    orjson = None
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "500"))
+
+COLUMNS = (
+    models.AudioAnalysis.id,
+    models.AudioAnalysis.file_id,
+    models.AudioAnalysis.user_id,
+    models.AudioAnalysis.transcription,
+    models.AudioAnalysis.pause_to_speech_analysis,
+    models.AudioAnalysis.filler_word_analysis,
+    models.AudioAnalysis.stress_analysis,
+    models.AudioAnalysis.analysis_profile,
+)
+FIELDS = tuple(column.key for column in COLUMNS)
+
+
+def _encode_line(row) -> bytes:
+    record = dict(zip(FIELDS, row))
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str).encode() + b"\n"
+
+
+def iter_ndjson(user_ids=None, compress: bool = False, chunk_rows: int = EXPORT_CHUNK_ROWS):
+    """
+    Yield NDJSON bytes for the analyses of `user_ids` (None = everyone).
+    Opens its own session: the request's session is already closed by the
+    time a StreamingResponse body is iterated.
+    """
+    db = SessionLocal()
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31 = gzip
+    try:
+        query = db.query(*COLUMNS)
+        if user_ids is not None:
+            query = query.filter(models.AudioAnalysis.user_id.in_(list(user_ids)))
+        query = query.order_by(models.AudioAnalysis.id).yield_per(chunk_rows)
+
+        lines = []
+        for row in query:
+            lines.append(_encode_line(row))
+            if len(lines) >= chunk_rows:
+                chunk = b"".join(lines)
+                lines.clear()
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else chunk
+        chunk = b"".join(lines)
+        if compressor:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_FINISH)
+        elif chunk:
+            yield chunk
+    finally:
+        db.close()
+
+
+def ndjson_response(user_ids=None, compress: bool = False, filename: str = "analyses.ndjson"):
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(iter_ndjson(user_ids, compress), media_type="application/x-ndjson",
+                             headers=headers)
@@ -0,0 +1,52 @@
+# feature_tracks.py
+import zlib
+import numpy as np
+
+import models
+
+# Storage dtype per track; anything not listed is stored as float16.
+# F0 is kept in float32 so Hz values survive without quantisation steps.
+TRACK_DTYPES = {
+    "f0": "float32",
+}
+DEFAULT_DTYPE = "float16"
+ENCODING = "zlib"
+
+
+def encode_track(values, dtype: str = DEFAULT_DTYPE) -> bytes:
+    """
+    Pack a 1-D (frames) or 2-D (frames x channels) array as compressed
+    little-endian floats. Rows are time-major so byte offsets map to frames.
+    """
+    arr = np.asarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+    return zlib.compress(np.ascontiguousarray(arr).tobytes(), 6)
+
+
+def decode_track(blob: bytes) -> bytes:
+    """Return the raw little-endian array bytes of a stored track."""
+    return zlib.decompress(blob)
+
+
+def to_rows(tracks: dict) -> list:
+    """
+    Convert {name: (array, frame_rate)} as filled by the analyzers
+    into FeatureTrack rows ready to attach to an AudioAnalysis.
+    """
+    rows = []
+    for name, (values, frame_rate) in tracks.items():
+        arr = np.asarray(values, dtype=np.float32)
+        if arr.ndim == 0 or arr.size == 0:
+            continue
+        if arr.ndim == 1:
+            arr = arr[:, None]
+        dtype = TRACK_DTYPES.get(name, DEFAULT_DTYPE)
+        rows.append(models.FeatureTrack(
+            name=name,
+            dtype=dtype,
+            n_frames=int(arr.shape[0]),
+            n_channels=int(arr.shape[1]),
+            frame_rate=float(frame_rate),
+            encoding=ENCODING,
+            data=encode_track(arr, dtype),
+        ))
+    return rows
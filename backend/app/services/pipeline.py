@@ -0,0 +1,276 @@
+# pipeline.py
+"""
+Analyzer registry and dependency-aware scheduler.
+
+Every node declares the named inputs it consumes and produces one named
+output. Intermediates (frame_rms, spectrogram, speech, transcript) are nodes too,
+so each is computed once per run and shared by every analyzer that lists
+it. run() resolves only the nodes the requested targets need and executes
+independent nodes concurrently on a thread pool (numpy, scipy and the
+Whisper forward pass release the GIL for most of their work).
+
+Values supplied by the caller rather than computed:
+    waveform     (y, sr) - preprocessed mono float32 samples
+    speech_options  denoise / highpass options for the transcript's input
+                 (optional, default {}; see preprocess.enhance_speech)
+    tracks       dict collecting frame-level feature tracks for charting
+                 (optional, default {})
+    asr_options  model_name / decode options for the transcript node
+                 (optional, default {})
+    cancel       cancellation.CancelToken checked between ASR chunks
+                 (optional, default None)
+
+Adding an analyzer is a decorated function in this module, or in any
+module imported by it; every node registered with kind="analyzer" runs
+for /analyze-audio without touching main.py:
+
+    @register("energy_peaks", inputs=("frame_rms",))
+    def energy_peaks(frame_rms):
+        ...
+
+Nodes registered with kind="variant" are alternative implementations of
+an analyzer that only run when named as a target (see analysis_profiles).
+"""
+import os
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+
+from analysis.audio_features import get_pause_to_speech_ratio
+from analysis.filler_detection import detect_filler_words
+from analysis.stress_detection import analyze_stress
+from app.services import asr
+from app.services.cancellation import Cancelled
+from app.services.analysis import audio_features as detailed_audio_features
+from app.services.analysis import filler_detection as detailed_filler_detection
+from app.services.analysis import stress_detection as detailed_stress_detection
+from app.services.analysis.audio_io import frame_rms as compute_frame_rms
+from app.services.analysis.preprocess import enhance_speech
+
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+
+PROVIDED = ("waveform", "tracks", "asr_options", "speech_options", "cancel")
+DEFAULTS = {"tracks": dict, "asr_options": dict, "speech_options": dict, "cancel": lambda: None}  # factories for optional provided values
+
+_executor = None
+
+
+class InlineExecutor(Executor):
+    """
+    Runs each submitted node on the calling thread before submit() returns.
+    For profiled requests: cProfile only sees the thread that enabled it,
+    and per-stage tracemalloc peaks are only meaningful one stage at a time.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+inline = InlineExecutor()
+
+
+class Node:
+    def __init__(self, name: str, func, inputs, kind: str):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.kind = kind
+
+
+_nodes = {}
+
+
+def register(name: str, inputs=(), kind: str = "analyzer"):
+    """Decorator registering `func(**inputs)` as node `name`."""
+    def decorator(func):
+        if name in _nodes or name in PROVIDED:
+            raise ValueError(f"Pipeline node {name!r} is already defined")
+        _nodes[name] = Node(name, func, inputs, kind)
+        return func
+    return decorator
+
+
+def analyzers() -> list:
+    """Names of all registered analyzers (the default run targets)."""
+    return [node.name for node in _nodes.values() if node.kind == "analyzer"]
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="pipeline")
+    return _executor
+
+
+def _resolve(targets) -> list:
+    """Nodes needed for `targets`, in dependency order. Raises on unknown inputs or cycles."""
+    order, visiting, done = [], set(), set()
+
+    def visit(name, needed_by):
+        if name in done or name in PROVIDED:
+            return
+        if name not in _nodes:
+            raise ValueError(f"Unknown pipeline input {name!r} (needed by {needed_by})")
+        if name in visiting:
+            raise ValueError(f"Pipeline dependency cycle through {name!r}")
+        visiting.add(name)
+        for dep in _nodes[name].inputs:
+            visit(dep, name)
+        visiting.discard(name)
+        done.add(name)
+        order.append(_nodes[name])
+
+    for target in targets:
+        visit(target, "run()")
+    return order
+
+
+def run(provided: dict, targets=None, stage=None, executor=None, on_result=None, cancel=None) -> dict:
+    """
+    Compute `targets` (default: every analyzer) from the `provided` values.
+
+    Args:
+        provided: values for PROVIDED names, e.g. {"waveform": (y, sr), "tracks": {}}
+        targets: node names to compute
+        stage: optional `stage(name)` context manager factory wrapped around
+            each node, e.g. lambda name: profiling.stage(name, profiler)
+        executor: thread pool to run nodes on (default: shared module pool);
+            pass `inline` to run them one at a time on the calling thread
+        on_result: optional `on_result(name, value)` called as each node
+            finishes, in completion order (e.g. to stream progress)
+        cancel: optional CancelToken (defaults to provided["cancel"]); checked
+            before each node starts, so a cancelled run stops starting work and
+            raises cancellation.Cancelled once the running nodes return
+    Returns:
+        {target name: output}
+    """
+    targets = list(targets) if targets is not None else analyzers()
+    pending = _resolve(targets)
+    executor = executor or _get_executor()
+    stage = stage or (lambda name: nullcontext())
+    values = dict(provided)
+    for name, factory in DEFAULTS.items():
+        values.setdefault(name, factory())
+    cancel = cancel or values["cancel"]
+
+    def call(node, kwargs):
+        if cancel is not None:
+            cancel.check(node.name)  # queued behind other nodes while the run was cancelled
+        with stage(node.name):
+            return node.func(**kwargs)
+
+    running = {}
+    try:
+        while pending or running:
+            for node in [n for n in pending if all(dep in values for dep in n.inputs)]:
+                if cancel is not None:
+                    cancel.check(node.name)
+                pending.remove(node)
+                kwargs = {dep: values[dep] for dep in node.inputs}
+                running[executor.submit(call, node, kwargs)] = node
+            if not running:
+                missing = sorted({dep for n in pending for dep in n.inputs if dep in PROVIDED and dep not in values})
+                raise ValueError(f"Pipeline inputs not provided: {missing}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node = running.pop(future)
+                values[node.name] = future.result()
+                if on_result is not None:
+                    on_result(node.name, values[node.name])
+    except Cancelled:
+        # Started nodes can't be interrupted; wait for them so the caller doesn't
+        # release its analysis slot while their CPU work is still running
+        wait([future for future in running if not future.cancel()])
+        running.clear()
+        raise
+    finally:
+        for future in running:
+            future.cancel()
+    return {name: values[name] for name in targets}
+
+
+# -------------------
+# Shared intermediates
+# -------------------
+@register("frame_rms", inputs=("waveform",), kind="intermediate")
+def frame_rms(waveform):
+    y, sr = waveform
+    return compute_frame_rms(y, sr)
+
+
+@register("spectrogram", inputs=("waveform",), kind="intermediate")
+def spectrogram(waveform):
+    """Magnitude STFT (2048-sample window, 512 hop), librosa's framing."""
+    y, sr = waveform
+    return detailed_stress_detection.magnitude_spectrogram(y)
+
+
+@register("speech", inputs=("waveform", "speech_options"), kind="intermediate")
+def speech(waveform, speech_options):
+    """Denoised, pre-emphasized copy for the recognizer; the analyzers keep the waveform."""
+    y, sr = waveform
+    return enhance_speech(y, sr, **speech_options), sr
+
+
+@register("transcript", inputs=("speech", "asr_options", "cancel"), kind="intermediate")
+def transcript(speech, asr_options, cancel):
+    y, sr = speech
+    try:
+        return asr.transcribe_samples(y, sr, cancel=cancel, **asr_options)
+    except Cancelled:
+        raise
+    except Exception as e:
+        # detect_filler_words reports this the same way it did when it called ASR itself
+        return {"text": "", "segments": [], "error": str(e)}
+
+
+# -------------------
+# Analyzers
+# -------------------
+@register("pause", inputs=("waveform", "frame_rms", "tracks"))
+def pause(waveform, frame_rms, tracks):
+    y, sr = waveform
+    return get_pause_to_speech_ratio(tracks=tracks, y=y, sr=sr, frames=frame_rms)
+
+
+@register("filler", inputs=("transcript",))
+def filler(transcript):
+    return detect_filler_words(transcription=transcript)
+
+
+@register("stress", inputs=("waveform", "frame_rms"))
+def stress(waveform, frame_rms):
+    y, sr = waveform
+    return analyze_stress(y=y, sr=sr, frames=frame_rms)
+
+
+# -------------------
+# Variants: the app/services/analysis stack (pydub silence, pyin/MFCC, fuzzy fillers)
+# -------------------
+@register("pause_silence", inputs=("waveform",), kind="variant")
+def pause_silence(waveform):
+    y, sr = waveform
+    return detailed_audio_features.get_pause_to_speech_ratio(y=y, sr=sr)
+
+
+@register("stress_spectral", inputs=("waveform", "spectrogram", "tracks"), kind="variant")
+def stress_spectral(waveform, spectrogram, tracks):
+    y, sr = waveform
+    return detailed_stress_detection.analyze_stress(tracks=tracks, y=y, sr=sr, spectrogram=spectrogram)
+
+
+@register("filler_fuzzy", inputs=("transcript",), kind="variant")
+def filler_fuzzy(transcript):
+    # Same shape as the basic filler analyzer so storage and the UI don't care
+    text = transcript.get("text", "").lower()
+    result = detailed_filler_detection.detect_filler_words(text)
+    out = {"filler_words": result["frequency"], "total_count": result["count"], "transcription": text}
+    if transcript.get("error"):
+        out["error"] = transcript["error"]
+    return out
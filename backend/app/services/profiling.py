@@ -0,0 +1,167 @@
+# profiling.py
+"""
+Opt-in per-request profiling for the analysis pipeline.
+
+When profiling mode is enabled (PROFILING_ENABLED=1 or via the admin API),
+a request is profiled if it sends `X-Profile: 1` or is picked by the
+PROFILE_SAMPLE_RATE sampler. A profiled request runs under cProfile, and
+each pipeline stage records its wall time and tracemalloc peak. Reports
+are written to PROFILE_DIR as a pstats `.prof` file plus a `.json` summary.
+
+Only one request is profiled at a time (cProfile cannot be nested); others
+run unprofiled meanwhile. cProfile only sees the thread that enabled it, so
+start()/stop() are called on the thread running the analysis, and a
+profiled request runs its pipeline nodes there too (pipeline.inline)
+instead of on the pool; stage timings are then sequential. tracemalloc
+peaks are process-wide, so concurrent unprofiled requests can still bleed
+into the memory numbers.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from app.services import metrics
+
+PROFILE_HEADER = "x-profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+settings = {
+    "enabled": os.getenv("PROFILING_ENABLED", "0") == "1",
+    "sample_rate": float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+}
+
+_active = threading.Lock()  # held while a request is being profiled
+
+
+class RequestProfiler:
+    def __init__(self, name: str, reason: str):
+        self.name = name
+        self.reason = reason
+        self.stages = {}
+        self._profile = cProfile.Profile()
+        self._started = None
+        self._running = False
+        self._owns_tracemalloc = False
+        self.total_seconds = 0.0
+
+    def start(self):
+        """Begin profiling on the calling thread."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._started = time.perf_counter()
+        self._running = True
+        self._profile.enable()
+
+    def stop(self):
+        """Stop profiling; must run on the thread that called start()."""
+        if not self._running:
+            return
+        self._profile.disable()
+        self._running = False
+        self.total_seconds = time.perf_counter() - self._started
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def finish(self, status: str):
+        """Write the report (if anything ran) and free the profiling slot."""
+        try:
+            self.stop()
+            if self._started is not None:
+                self.write_report(status)
+        finally:
+            _active.release()
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self._running:
+            yield
+            return
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            self.stages[name] = {
+                "seconds": round(time.perf_counter() - start, 6),
+                "peak_bytes": max(peak - base, 0),
+            }
+
+    def write_report(self, status: str, top: int = 40) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        prof_path = os.path.join(PROFILE_DIR, f"{self.name}.prof")
+        self._profile.dump_stats(prof_path)
+
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(top)
+        summary = {
+            "name": self.name,
+            "created_at": datetime.now().isoformat(),
+            "reason": self.reason,
+            "status": status,
+            "total_seconds": round(self.total_seconds, 6),
+            "stages": self.stages,
+            "pstats_file": os.path.basename(prof_path),
+            "top_functions": out.getvalue(),
+        }
+        json_path = os.path.join(PROFILE_DIR, f"{self.name}.json")
+        with open(json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+        return json_path
+
+
+def profiler_for(request, label: str):
+    """
+    Return a RequestProfiler if this request should be profiled, else None.
+    The caller starts/stops it around the work and must call finish().
+    """
+    if not settings["enabled"]:
+        return None
+    if request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        reason = "header"
+    elif settings["sample_rate"] > 0 and random.random() < settings["sample_rate"]:
+        reason = "sampled"
+    else:
+        return None
+    if not _active.acquire(blocking=False):
+        return None
+    return RequestProfiler(f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{label}", reason)
+
+
+@contextmanager
+def stage(name: str, profiler: RequestProfiler = None):
+    """Time a pipeline stage into metrics and, if profiling, the request report."""
+    with metrics.stage(name):
+        if profiler is None:
+            yield
+        else:
+            with profiler.stage(name):
+                yield
+
+
+def list_reports() -> list:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    reports = []
+    for fname in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not fname.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, fname)) as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summary.pop("top_functions", None)
+        reports.append(summary)
+    return reports
@@ -0,0 +1,214 @@
+# question_cache.py
+"""
+Interview question sets keyed by (role, company), served from memory.
+
+Lookup order:
+1. precomputed sets: every *.json in QUESTION_SETS_DIR (same shape as the
+   n8n webhook response, e.g. output/gemini_output.json); never expire.
+   Files without a real role and company (missing, or "undefined" as the
+   webhook writes them when the form fields were empty) are skipped
+2. generated sets cached for QUESTION_CACHE_TTL seconds, LRU-bounded by
+   QUESTION_CACHE_MAX_ENTRIES
+3. the upstream generator (n8n webhook at QUESTION_WEBHOOK_URL)
+
+Concurrent requests for the same key are coalesced: the first one starts
+the upstream generation and the others await its result, so a burst of
+identical requests costs one generation. If the generator fails, an
+expired entry for the key is served rather than an error.
+
+QUESTION_GENERATOR=stub swaps the webhook for a local deterministic
+generator (tests, load tests, offline development).
+"""
+import asyncio
+import glob
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import metrics
+
+QUESTION_WEBHOOK_URL = os.getenv("QUESTION_WEBHOOK_URL", "http://localhost:5678/webhook-test/job-questions")
+QUESTION_GENERATOR = os.getenv("QUESTION_GENERATOR", "webhook")
+QUESTION_CACHE_TTL = float(os.getenv("QUESTION_CACHE_TTL", str(24 * 3600)))
+QUESTION_CACHE_MAX_ENTRIES = int(os.getenv("QUESTION_CACHE_MAX_ENTRIES", "256"))
+QUESTION_GENERATOR_TIMEOUT = float(os.getenv("QUESTION_GENERATOR_TIMEOUT", "60"))
+QUESTION_SETS_DIR = os.getenv(
+    "QUESTION_SETS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "output"))
+
+GENERATIONS = metrics.Counter(
+    "virtuhire_question_generations", "Upstream question-set generations", ("outcome",))
+COALESCED = metrics.Counter(
+    "virtuhire_question_requests_coalesced", "Question requests that joined an in-flight generation")
+
+
+# What the webhook writes for an empty form field; such sets can't be matched to a request
+PLACEHOLDER_VALUES = {"", "undefined", "null", "none"}
+
+
+class GenerationFailed(Exception):
+    pass
+
+
+def normalize_key(role: str, company: str) -> tuple:
+    def norm(value):
+        return re.sub(r"\s+", " ", (value or "").strip().lower())
+    return norm(role), norm(company)
+
+
+# -------------------
+# Generators
+# -------------------
+def _webhook_generate(role: str, company: str) -> dict:
+    body = json.dumps({"job_role": role, "company_name": company}).encode()
+    req = urllib.request.Request(QUESTION_WEBHOOK_URL, data=body,
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=QUESTION_GENERATOR_TIMEOUT) as res:
+        return json.loads(res.read())
+
+
+def stub_generate(role: str, company: str) -> dict:
+    """Deterministic local stand-in for the webhook."""
+    role = role or "software engineer"
+    company = company or "the company"
+    templates = [
+        "Why do you want to work as a {role} at {company}?",
+        "Walk me through a project that best shows your skills as a {role}.",
+        "Describe a difficult technical decision you made and how you justified it.",
+        "Tell me about a time you disagreed with a teammate and how you resolved it.",
+        "How would you approach your first 90 days as a {role} at {company}?",
+    ]
+    return {
+        "role": role,
+        "company": company,
+        "questions": [t.format(role=role, company=company) for t in templates],
+        "source": "stub",
+    }
+
+
+def _validate(data) -> dict:
+    if not isinstance(data, dict) or not isinstance(data.get("questions"), list) or not data["questions"]:
+        raise GenerationFailed("Generator returned no questions")
+    return data
+
+
+# -------------------
+# Cache
+# -------------------
+class QuestionCache:
+    def __init__(self, generate=None, ttl: float = QUESTION_CACHE_TTL,
+                 max_entries: int = QUESTION_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            generate: blocking `generate(role, company) -> dict`; runs in a
+                worker thread
+            ttl: seconds a generated set is served before regenerating
+            max_entries: generated sets kept (least recently used evicted)
+        """
+        self._generate = generate or (stub_generate if QUESTION_GENERATOR == "stub" else _webhook_generate)
+        self.ttl = ttl
+        self.max_entries = max(int(max_entries), 1)
+        self._entries = OrderedDict()   # key -> (expires_at, data)
+        self._precomputed = {}
+        self._inflight = {}             # key -> concurrent.futures.Future
+        self._lock = threading.RLock()  # _finish may run inline from add_done_callback
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="questions")
+
+    def load_precomputed(self, directory: str = QUESTION_SETS_DIR) -> int:
+        count = 0
+        for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+            try:
+                with open(path) as f:
+                    data = _validate(json.load(f))
+            except (OSError, ValueError, GenerationFailed) as e:
+                print(f"Skipping question set {path}: {e}")
+                continue
+            missing = [field for field, value in zip(("role", "company"), normalize_key(
+                data.get("role", ""), data.get("company", ""))) if value in PLACEHOLDER_VALUES]
+            if missing:
+                print(f"Skipping question set {path}: no {' or '.join(missing)} to serve it for")
+                continue
+            self.put_precomputed(data.get("role", ""), data.get("company", ""), data)
+            count += 1
+        return count
+
+    def put_precomputed(self, role: str, company: str, data: dict):
+        self._precomputed[normalize_key(role, company)] = _validate(data)
+
+    def _cached(self, key, allow_expired: bool = False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, data = entry
+            if expires_at <= time.monotonic() and not allow_expired:
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def _store(self, key, data: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _generate_and_store(self, key, role: str, company: str):
+        # Runs on the cache's own executor, so a caller that goes away
+        # (client disconnect) does not abandon the requests coalesced onto it
+        try:
+            data = _validate(self._generate(role, company))
+        except Exception as e:
+            GENERATIONS.inc(outcome="error")
+            stale = self._cached(key, allow_expired=True)
+            if stale is None:
+                raise GenerationFailed(str(e)) from e
+            return stale, "stale"
+        self._store(key, data)
+        GENERATIONS.inc(outcome="ok")
+        return data, "generated"
+
+    def _finish(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    async def get(self, role: str, company: str):
+        """Returns (question set dict, source) with source precomputed/cache/generated/stale."""
+        key = normalize_key(role, company)
+        if key in self._precomputed:
+            metrics.CACHE_HITS.inc(cache="questions")
+            return self._precomputed[key], "precomputed"
+        data = self._cached(key)
+        if data is not None:
+            metrics.CACHE_HITS.inc(cache="questions")
+            return data, "cache"
+        metrics.CACHE_MISSES.inc(cache="questions")
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._generate_and_store, key, role.strip(), company.strip())
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._finish(key))
+            else:
+                COALESCED.inc()
+        # concurrent Future: safe to await from any event loop / worker
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "precomputed": len(self._precomputed),
+            "cached": len(self._entries),
+            "expired": sum(1 for expires_at, _ in self._entries.values() if expires_at <= now),
+            "in_flight": len(self._inflight),
+        }
+
+
+question_cache = QuestionCache()
+question_cache.load_precomputed()
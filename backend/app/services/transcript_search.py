@@ -0,0 +1,110 @@
+# transcript_search.py
+"""
+Full-text search over AudioAnalysis.transcription.
+
+SQLite: an external-content FTS5 table (audio_analyses_fts) mirrors the
+transcription column and is kept in sync by triggers, so every insert,
+update (e.g. reanalyze.py) and delete maintains the index without any
+application code. Results are ranked with bm25().
+
+MySQL: a FULLTEXT index on the column, queried with MATCH ... AGAINST.
+
+Other databases fall back to an unranked LIKE scan.
+"""
+import re
+
+from sqlalchemy import text
+
+FTS_TABLE = "audio_analyses_fts"
+MYSQL_INDEX = "ix_audio_analyses_transcription_ft"
+
+_SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        transcription, content='audio_analyses', content_rowid='id',
+        tokenize='porter unicode61')""",
+    f"""CREATE TRIGGER IF NOT EXISTS audio_analyses_fts_ai AFTER INSERT ON audio_analyses BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, transcription) VALUES (new.id, new.transcription);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS audio_analyses_fts_ad AFTER DELETE ON audio_analyses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, transcription) VALUES ('delete', old.id, old.transcription);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS audio_analyses_fts_au AFTER UPDATE OF transcription ON audio_analyses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, transcription) VALUES ('delete', old.id, old.transcription);
+        INSERT INTO {FTS_TABLE}(rowid, transcription) VALUES (new.id, new.transcription);
+    END""",
+]
+
+
+def install(engine):
+    """Create the full-text index (idempotent); backfills existing rows the first time."""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"),
+                {"name": FTS_TABLE}).first()
+            for statement in _SQLITE_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        elif dialect == "mysql":
+            exists = conn.execute(text(
+                "SELECT 1 FROM information_schema.statistics WHERE table_schema = DATABASE() "
+                "AND table_name = 'audio_analyses' AND index_name = :name"), {"name": MYSQL_INDEX}).first()
+            if not exists:
+                conn.execute(text(f"ALTER TABLE audio_analyses ADD FULLTEXT INDEX {MYSQL_INDEX} (transcription)"))
+
+
+def _terms(query: str) -> list:
+    return re.findall(r"\w+", query.lower())
+
+
+def _fts5_query(terms: list) -> str:
+    # Quote every term so user input can't inject FTS5 syntax; the last
+    # term is a prefix match so partial words still find results
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(db, user_id: int, query: str, limit: int = 20, offset: int = 0) -> list:
+    """
+    Best matches first among `user_id`'s analyses.
+    Returns [{"id", "file_id", "snippet", "score"}]; higher score is better.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    dialect = db.get_bind().dialect.name
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+    if dialect == "sqlite":
+        params["q"] = _fts5_query(terms)
+        rows = db.execute(text(f"""
+            SELECT a.id, a.file_id,
+                   snippet({FTS_TABLE}, 0, '[', ']', '…', 12) AS snippet,
+                   -bm25({FTS_TABLE}) AS score
+            FROM {FTS_TABLE} JOIN audio_analyses a ON a.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :q AND a.user_id = :user_id
+            ORDER BY bm25({FTS_TABLE})
+            LIMIT :limit OFFSET :offset"""), params)
+    elif dialect == "mysql":
+        params["q"] = " ".join(terms)
+        rows = db.execute(text("""
+            SELECT id, file_id, LEFT(transcription, 200) AS snippet,
+                   MATCH(transcription) AGAINST (:q IN NATURAL LANGUAGE MODE) AS score
+            FROM audio_analyses
+            WHERE user_id = :user_id AND MATCH(transcription) AGAINST (:q IN NATURAL LANGUAGE MODE)
+            ORDER BY score DESC
+            LIMIT :limit OFFSET :offset"""), params)
+    else:
+        params["q"] = f"%{' '.join(terms)}%"
+        rows = db.execute(text("""
+            SELECT id, file_id, substr(transcription, 1, 200) AS snippet, 0.0 AS score
+            FROM audio_analyses
+            WHERE user_id = :user_id AND lower(transcription) LIKE :q
+            ORDER BY id DESC
+            LIMIT :limit OFFSET :offset"""), params)
+    return [
+        {"id": r.id, "file_id": r.file_id, "snippet": r.snippet, "score": float(r.score or 0.0)}
+        for r in rows
+    ]
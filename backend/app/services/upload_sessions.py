@@ -0,0 +1,293 @@
+# upload_sessions.py
+"""
+Resumable chunked uploads.
+
+A session is a sparse file <id>.part plus <id>.json metadata in
+UPLOAD_SESSIONS_DIR. Clients write chunks at explicit byte offsets in
+any order, and can re-send a chunk safely. They ask which ranges have
+arrived and resume from the gaps. Once [0, total_size) is covered the
+session can be finalized: the assembled file is handed to analysis, and
+the session is removed after that.
+
+Finalizing marks the session under its lock; until the analysis ends
+(release() or delete()) further chunks and finalizes are refused with
+UploadBusy, so the assembled file can't change or be analyzed twice.
+
+Each user may hold UPLOAD_USER_MAX_SESSIONS open sessions reserving at most
+UPLOAD_USER_MAX_BYTES in total (a session without a declared size reserves
+UPLOAD_MAX_BYTES). Sessions idle for longer than UPLOAD_SESSION_TTL are
+removed by cleanup_expired(), which runs whenever a session is created and
+at startup.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+UPLOAD_SESSIONS_DIR = os.getenv("UPLOAD_SESSIONS_DIR", os.path.join("uploads", "partial"))
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(512 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))  # hint for clients
+UPLOAD_MAX_CHUNK_BYTES = int(os.getenv("UPLOAD_MAX_CHUNK_BYTES", str(16 * 1024 * 1024)))
+UPLOAD_USER_MAX_SESSIONS = int(os.getenv("UPLOAD_USER_MAX_SESSIONS", "4"))
+UPLOAD_USER_MAX_BYTES = int(os.getenv("UPLOAD_USER_MAX_BYTES", str(1024 * 1024 * 1024)))
+# A finalize that hasn't released its session after this long is assumed dead
+UPLOAD_FINALIZE_TIMEOUT = float(os.getenv("UPLOAD_FINALIZE_TIMEOUT", "900"))
+
+_ID = re.compile(r"^[0-9a-f]{32}$")
+_locks = {}
+_locks_guard = threading.Lock()
+_create_lock = threading.Lock()
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class InvalidChunk(ValueError):
+    pass
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+class UploadBusy(Exception):
+    pass
+
+
+class UploadIncomplete(Exception):
+    def __init__(self, missing):
+        super().__init__(f"Upload incomplete, missing byte ranges {missing}")
+        self.missing = missing
+
+
+def _lock(upload_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(upload_id, threading.Lock())
+
+
+def _paths(upload_id: str):
+    if not _ID.match(upload_id or ""):
+        raise UploadNotFound(upload_id)
+    base = os.path.join(UPLOAD_SESSIONS_DIR, upload_id)
+    return base + ".part", base + ".json"
+
+
+def _save(meta: dict):
+    _, meta_path = _paths(meta["upload_id"])
+    tmp = meta_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)  # readers never see a half-written file
+
+
+def _load(upload_id: str, user_id: int) -> dict:
+    _, meta_path = _paths(upload_id)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        raise UploadNotFound(upload_id)
+    if meta["user_id"] != user_id or meta["updated_at"] + UPLOAD_SESSION_TTL < time.time():
+        raise UploadNotFound(upload_id)
+    return meta
+
+
+def merge_range(ranges: list, start: int, end: int) -> list:
+    """Add half-open [start, end) to sorted disjoint ranges, coalescing neighbours."""
+    merged = []
+    for lo, hi in sorted(ranges + [[start, end]]):
+        if merged and lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+def missing_ranges(ranges: list, total_size: int) -> list:
+    missing, cursor = [], 0
+    for lo, hi in ranges:
+        if lo > cursor:
+            missing.append([cursor, lo])
+        cursor = max(cursor, hi)
+    if total_size is not None and cursor < total_size:
+        missing.append([cursor, total_size])
+    return missing
+
+
+def _finalizing(meta: dict) -> bool:
+    started = meta.get("finalizing_at")
+    return started is not None and started + UPLOAD_FINALIZE_TIMEOUT > time.time()
+
+
+def _user_sessions(user_id: int) -> list:
+    sessions = []
+    try:
+        names = os.listdir(UPLOAD_SESSIONS_DIR)
+    except FileNotFoundError:
+        return sessions
+    for name in names:
+        upload_id, ext = os.path.splitext(name)
+        if ext != ".json" or not _ID.match(upload_id):
+            continue
+        try:
+            sessions.append(_load(upload_id, user_id))
+        except UploadNotFound:
+            pass  # another user's, or expired
+    return sessions
+
+
+def _reserved(meta: dict) -> int:
+    return meta["total_size"] if meta["total_size"] is not None else UPLOAD_MAX_BYTES
+
+
+def describe(meta: dict) -> dict:
+    total = meta["total_size"]
+    received = sum(hi - lo for lo, hi in meta["ranges"])
+    return {
+        "upload_id": meta["upload_id"],
+        "filename": meta["filename"],
+        "total_size": total,
+        "received": meta["ranges"],
+        "received_bytes": received,
+        "missing": missing_ranges(meta["ranges"], total) if total is not None else None,
+        "complete": total is not None and received == total,
+        "finalizing": _finalizing(meta),
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "expires_at": meta["updated_at"] + UPLOAD_SESSION_TTL,
+    }
+
+
+# -------------------
+# Session lifecycle
+# -------------------
+def create(user_id: int, total_size: int = None, filename: str = None) -> dict:
+    if total_size is not None and not 0 < total_size <= UPLOAD_MAX_BYTES:
+        raise InvalidChunk(f"total_size must be between 1 and {UPLOAD_MAX_BYTES} bytes")
+    os.makedirs(UPLOAD_SESSIONS_DIR, exist_ok=True)
+    cleanup_expired()
+    with _create_lock:  # check and reserve together (per process)
+        open_sessions = _user_sessions(user_id)
+        if len(open_sessions) >= UPLOAD_USER_MAX_SESSIONS:
+            raise QuotaExceeded(f"At most {UPLOAD_USER_MAX_SESSIONS} open uploads per user; "
+                                "finish or delete one first")
+        reserved = sum(_reserved(meta) for meta in open_sessions)
+        requested = total_size if total_size is not None else UPLOAD_MAX_BYTES
+        if reserved + requested > UPLOAD_USER_MAX_BYTES:
+            raise QuotaExceeded(f"Open uploads would reserve {reserved + requested} bytes, "
+                                f"more than the {UPLOAD_USER_MAX_BYTES} allowed per user")
+        now = time.time()
+        meta = {"upload_id": uuid.uuid4().hex, "user_id": user_id, "filename": filename,
+                "total_size": total_size, "ranges": [], "created_at": now, "updated_at": now}
+        part_path, _ = _paths(meta["upload_id"])
+        open(part_path, "wb").close()
+        _save(meta)
+    return meta
+
+
+def get(upload_id: str, user_id: int) -> dict:
+    return _load(upload_id, user_id)
+
+
+def write_chunk(upload_id: str, user_id: int, offset: int, data: bytes) -> dict:
+    """Write `data` at byte `offset`; rewriting an already received range is harmless."""
+    with _lock(upload_id):
+        meta = _load(upload_id, user_id)
+        if _finalizing(meta):
+            raise UploadBusy("Upload is being analyzed")
+        end = offset + len(data)
+        limit = meta["total_size"] if meta["total_size"] is not None else UPLOAD_MAX_BYTES
+        if offset < 0 or end > limit:
+            raise InvalidChunk(f"Chunk [{offset}, {end}) is outside the upload (0-{limit} bytes)")
+        if data:
+            part_path, _ = _paths(upload_id)
+            with open(part_path, "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())  # acknowledged bytes survive a crash
+            meta["ranges"] = merge_range(meta["ranges"], offset, end)
+        meta["updated_at"] = time.time()
+        _save(meta)
+        return meta
+
+
+def assembled_path(upload_id: str, user_id: int, total_size: int = None) -> str:
+    """
+    Path of the complete upload, fixing total_size if it wasn't declared at
+    creation, and mark the session as finalizing until release()/delete().
+    Raises UploadIncomplete listing the gaps, or UploadBusy if another
+    finalize holds it.
+    """
+    with _lock(upload_id):
+        meta = _load(upload_id, user_id)
+        if _finalizing(meta):
+            raise UploadBusy("Upload is already being analyzed")
+        if meta["total_size"] is None:
+            if total_size is None:
+                raise InvalidChunk("total_size is required to finalize this upload")
+            received_end = meta["ranges"][-1][1] if meta["ranges"] else 0
+            if total_size < received_end:
+                raise InvalidChunk(f"total_size {total_size} is smaller than the {received_end} bytes received")
+            meta["total_size"] = total_size
+            _save(meta)
+        elif total_size is not None and total_size != meta["total_size"]:
+            raise InvalidChunk(f"total_size {total_size} does not match the declared {meta['total_size']}")
+        missing = missing_ranges(meta["ranges"], meta["total_size"])
+        if missing:
+            raise UploadIncomplete(missing)
+        meta["finalizing_at"] = meta["updated_at"] = time.time()
+        _save(meta)
+        part_path, _ = _paths(upload_id)
+        return part_path
+
+
+def release(upload_id: str, user_id: int):
+    """End a finalize that will be retried: chunks and finalize are accepted again."""
+    with _lock(upload_id):
+        try:
+            meta = _load(upload_id, user_id)
+        except UploadNotFound:
+            return
+        meta.pop("finalizing_at", None)
+        meta["updated_at"] = time.time()
+        _save(meta)
+
+
+def delete(upload_id: str):
+    for path in _paths(upload_id):
+        if os.path.exists(path):
+            os.remove(path)
+    with _locks_guard:
+        _locks.pop(upload_id, None)
+
+
+def cleanup_expired(now: float = None) -> int:
+    """Remove sessions idle for longer than UPLOAD_SESSION_TTL; returns how many."""
+    now = now or time.time()
+    removed = 0
+    try:
+        names = os.listdir(UPLOAD_SESSIONS_DIR)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        upload_id, ext = os.path.splitext(name)
+        if ext not in (".json", ".part") or not _ID.match(upload_id):
+            continue
+        meta_path = os.path.join(UPLOAD_SESSIONS_DIR, upload_id + ".json")
+        try:
+            with open(meta_path) as f:
+                updated_at = json.load(f)["updated_at"]
+        except (OSError, ValueError, KeyError):
+            # orphaned .part, or metadata lost mid-write: judge by file age
+            try:
+                updated_at = os.path.getmtime(os.path.join(UPLOAD_SESSIONS_DIR, name))
+            except OSError:
+                continue
+        if updated_at + UPLOAD_SESSION_TTL < now:
+            delete(upload_id)
+            removed += 1
+    return removed
@@ -0,0 +1,191 @@
+# write_behind.py
+"""
+Write-behind persistence for analysis results.
+
+With PERSIST_WRITE_BEHIND=1, finished results are handed to one background
+writer instead of each request doing its own add + commit. The writer
+groups whatever has queued into a single transaction, flushing when
+PERSIST_BATCH_MAX results are waiting or the oldest has waited
+PERSIST_FLUSH_MS, so concurrent analyses share one SQLite write lock /
+one MySQL fsync.
+
+save() blocks until the transaction holding the result has committed, so a
+client is only acknowledged once its result is durable. If it times out while
+the result is still queued, the result is withdrawn and PersistTimeout tells
+the caller nothing was stored; once the writer has taken it, save() waits for
+that commit's outcome. If a grouped commit
+fails, its results are retried one transaction each so a single bad row
+only fails its own request.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as ResultTimeout
+
+from app.services import metrics
+from database import SessionLocal
+
+PERSIST_WRITE_BEHIND = os.getenv("PERSIST_WRITE_BEHIND", "0") == "1"
+PERSIST_BATCH_MAX = int(os.getenv("PERSIST_BATCH_MAX", "32"))
+PERSIST_FLUSH_MS = float(os.getenv("PERSIST_FLUSH_MS", "20"))
+PERSIST_TIMEOUT = float(os.getenv("PERSIST_TIMEOUT", "30"))
+
+FLUSH_SECONDS = metrics.Histogram(
+    "virtuhire_persist_flush_seconds", "Duration of one grouped result commit")
+FLUSH_ROWS = metrics.Histogram(
+    "virtuhire_persist_flush_results", "Results committed per grouped transaction",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+ACK_SECONDS = metrics.Histogram(
+    "virtuhire_persist_ack_seconds", "Time from handing a result to the writer until it is durable")
+QUEUED = metrics.Gauge("virtuhire_persist_queued", "Results waiting for the writer")
+FLUSH_FAILURES = metrics.Counter(
+    "virtuhire_persist_flush_failures", "Grouped commits that failed and were retried per result")
+
+
+class PersistTimeout(Exception):
+    """save() gave up and withdrew the result; it will not be stored."""
+
+
+def enabled() -> bool:
+    return PERSIST_WRITE_BEHIND
+
+
+class _Pending:
+    __slots__ = ("records", "future", "enqueued")
+
+    def __init__(self, records):
+        self.records = records
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class WriteBehindPersister:
+    def __init__(self, session_factory=SessionLocal, max_batch: int = PERSIST_BATCH_MAX,
+                 flush_ms: float = PERSIST_FLUSH_MS):
+        """
+        Args:
+            session_factory: sessionmaker for the writer's own sessions
+            max_batch: results per transaction at most; a full batch flushes at once
+            flush_ms: longest a result waits for others to share its commit
+        """
+        self._session_factory = session_factory
+        self.max_batch = max(int(max_batch), 1)
+        self.flush_wait = max(flush_ms, 0.0) / 1000.0
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, *records) -> Future:
+        """Queue ORM objects to be added in one transaction; the future resolves once committed."""
+        return self._enqueue(records).future
+
+    def save(self, *records, timeout: float = PERSIST_TIMEOUT):
+        """
+        submit() and wait until durable; re-raises the commit error. Raises
+        PersistTimeout if the result was still queued after `timeout` seconds
+        (it is withdrawn, so the outcome is never "failed but stored later").
+        """
+        pending = self._enqueue(records)
+        try:
+            return pending.future.result(timeout)
+        except ResultTimeout:
+            with self._cond:
+                try:
+                    self._queue.remove(pending)
+                except ValueError:
+                    withdrawn = False  # the writer already holds it
+                else:
+                    withdrawn = True
+                    QUEUED.set(len(self._queue))
+            if withdrawn:
+                raise PersistTimeout(f"result not committed within {timeout} s; withdrawn")
+            return pending.future.result()
+
+    def _enqueue(self, records) -> _Pending:
+        pending = _Pending(records)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("write-behind persister is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="write-behind", daemon=True)
+                self._thread.start()
+            self._queue.append(pending)
+            QUEUED.set(len(self._queue))
+            self._cond.notify()
+        return pending
+
+    def close(self):
+        """Flush everything still queued and stop the writer."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _collect(self) -> list:
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            # Hold the first result back briefly so concurrent ones share its commit
+            while self._queue and len(self._queue) < self.max_batch and not self._closed:
+                remaining = self._queue[0].enqueued + self.flush_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+            QUEUED.set(len(self._queue))
+            return batch
+
+    def _worker(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return  # closed and drained
+            self._flush(batch)
+
+    def _commit(self, batch):
+        db = self._session_factory(expire_on_commit=False)  # ids stay readable after close
+        try:
+            for pending in batch:
+                db.add_all(pending.records)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        try:
+            self._commit(batch)
+            done = [(pending, None) for pending in batch]
+        except Exception as e:
+            if len(batch) == 1:
+                done = [(batch[0], e)]
+            else:
+                FLUSH_FAILURES.inc()
+                print(f"Grouped commit of {len(batch)} results failed ({e}); retrying individually")
+                done = []
+                for pending in batch:
+                    try:
+                        self._commit([pending])
+                        done.append((pending, None))
+                    except Exception as single_error:
+                        done.append((pending, single_error))
+        FLUSH_SECONDS.observe(time.perf_counter() - start)
+        FLUSH_ROWS.observe(len(batch))
+
+        now = time.monotonic()
+        for pending, error in done:
+            ACK_SECONDS.observe(now - pending.enqueued)
+            if error is None:
+                pending.future.set_result(pending.records)
+            else:
+                pending.future.set_exception(error)
+
+
+persister = WriteBehindPersister()
@@ -0,0 +1,141 @@
+"""
+Throughput vs latency benchmark for ASR micro-batching.
+
+Fires `--requests` transcriptions from `--concurrency` client threads at
+one model, first unbatched (model.transcribe behind a lock, i.e. what
+asr.transcribe does with ASR_MAX_BATCH=1), then through BatchingTranscriber
+for every max_batch x max_wait combination, and prints throughput and
+latency percentiles for each.
+
+Usage:
+    python bench_asr_batching.py --model base --audio-dir uploads --concurrency 8
+    python bench_asr_batching.py --random-init     # no weights download; exercises the scheduler only
+"""
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from app.services.asr_batching import BatchingTranscriber
+
+
+def load_model(name: str, random_init: bool):
+    import whisper
+    if not random_init:
+        return whisper.load_model(name, device="cpu")
+    import torch
+    from whisper.model import Whisper, ModelDimensions
+    torch.manual_seed(0)
+    dims = ModelDimensions(n_mels=80, n_audio_ctx=1500, n_audio_state=384, n_audio_head=6,
+                           n_audio_layer=4, n_vocab=51865, n_text_ctx=448, n_text_state=384,
+                           n_text_head=6, n_text_layer=4)  # "tiny" shape
+    return Whisper(dims).eval()
+
+
+def load_clips(audio_dir: str, count: int, seed: int = 0):
+    """16 kHz float32 clips (<= 30 s) from audio_dir, or synthetic speech-like tones."""
+    rng = np.random.default_rng(seed)
+    clips = []
+    if audio_dir:
+        import soundfile as sf
+        import librosa
+        for path in sorted(glob.glob(os.path.join(audio_dir, "*.wav"))):
+            y, sr = sf.read(path, dtype="float32", always_2d=True)
+            y = y.mean(axis=1)
+            if sr != 16000:
+                y = librosa.resample(y, orig_sr=sr, target_sr=16000)
+            clips.append(y[:16000 * 30])
+    if not clips:
+        for _ in range(8):
+            seconds = rng.uniform(3, 20)
+            t = np.arange(int(16000 * seconds)) / 16000
+            f0 = 120 + 30 * np.sin(2 * np.pi * 0.5 * t)
+            y = 0.2 * np.sin(2 * np.pi * np.cumsum(f0) / 16000) * (np.sin(2 * np.pi * 3 * t) > -0.3)
+            clips.append((y + 0.01 * rng.standard_normal(t.size)).astype(np.float32))
+    return [clips[i % len(clips)] for i in range(count)]
+
+
+def run(clips, concurrency: int, call):
+    latencies = []
+    lock = threading.Lock()
+    index = {"next": 0}
+
+    def client():
+        while True:
+            with lock:
+                i = index["next"]
+                index["next"] += 1
+            if i >= len(clips):
+                return
+            start = time.perf_counter()
+            call(clips[i])
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, np.array(latencies)
+
+
+def report(label, elapsed, latencies, audio_seconds):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    print(f"{label:<22} {len(latencies) / elapsed:8.2f} {audio_seconds / elapsed:9.1f} "
+          f"{p50:9.0f} {p95:9.0f} {p99:9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--random-init", action="store_true", help="random 'tiny'-shaped weights, no download")
+    parser.add_argument("--audio-dir", default=None, help="directory of .wav clips (default: synthetic)")
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--max-batch", default="2,4,8")
+    parser.add_argument("--max-wait-ms", default="5,20,50")
+    parser.add_argument("--language", default="en")
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.random_init)
+    clips = load_clips(args.audio_dir, args.requests)
+    audio_seconds = sum(len(c) for c in clips) / 16000
+    options = {"language": args.language, "fp16": False, "temperature": 0.0}
+    if args.random_init:
+        options["sample_len"] = 32  # random weights never emit <eot>; keep runs short
+        import app.services.asr_batching as batching
+        batching.BATCHABLE_OPTIONS = batching.BATCHABLE_OPTIONS | {"sample_len"}
+        batching.LOGPROB_THRESHOLD = float("-inf")
+        batching.COMPRESSION_RATIO_THRESHOLD = float("inf")
+
+    print(f"{len(clips)} requests, {audio_seconds:.0f} s audio, concurrency {args.concurrency}\n")
+    print(f"{'config':<22} {'req/s':>8} {'audio x':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+
+    if not args.random_init:
+        model_lock = threading.Lock()
+
+        def unbatched(clip):
+            with model_lock:
+                model.transcribe(clip, **options)
+
+        report("unbatched", *run(clips, args.concurrency, unbatched), audio_seconds)
+
+    for max_batch in [int(x) for x in args.max_batch.split(",")]:
+        for max_wait in [float(x) for x in args.max_wait_ms.split(",")]:
+            batcher = BatchingTranscriber(lambda: model, max_batch=max_batch, max_wait_ms=max_wait)
+            elapsed, latencies = run(clips, args.concurrency, lambda clip: batcher.transcribe(clip, **options))
+            report(f"batch={max_batch} wait={max_wait:g}ms", elapsed, latencies, audio_seconds)
+            batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Golden-output equivalence check for the analyzers.
+
+golden/ holds a small corpus of reference signals (synthetic speech-like
+audio in golden/signals/*.flac) and transcripts, plus the outputs the
+current analyzers produce for them (golden/expected.json). This script
+re-runs an analyzer, or a faster variant of it, over the corpus and
+compares every field with the outputs it is meant to reproduce. Numbers
+must agree within the tolerances declared in golden/manifest.json. Any
+other value must match exactly.
+
+It prints a diff report (and writes it as JSON with --report), and exits 1
+if anything is out of tolerance.
+
+Analyzers (named like the pipeline nodes):
+    pause, stress, filler                          analysis/ (basic stack)
+    pause_silence, stress_spectral, filler_fuzzy   app/services/analysis/
+    transcript_chunks                              asr.transcribe_chunked, recorded
+                                                   unchunked (see _burst_transcriber)
+    pipeline_balanced, pipeline_accurate           the /analyze-audio path: upload-rate
+                                                   AudioSegment -> segment_to_array ->
+                                                   preprocess_audio -> pipeline.run with
+                                                   the profile's pause and stress nodes
+
+Usage:
+    python check_golden.py                                   # every analyzer vs golden
+    python check_golden.py --analyzers stress_spectral \\
+        --variant stress_spectral=mypkg.fast_stress:analyze_stress
+    python check_golden.py --variant pause_silence=reference # pydub.silence path
+    python check_golden.py --update                          # accept current outputs
+    python check_golden.py --regenerate-corpus --update      # rebuild signals too
+"""
+import argparse
+import importlib
+import json
+import math
+import os
+import re
+import sys
+import warnings
+
+import numpy as np
+import soundfile as sf
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+GOLDEN_DIR = os.path.join(current_dir, "golden")
+MANIFEST = os.path.join(GOLDEN_DIR, "manifest.json")
+EXPECTED = os.path.join(GOLDEN_DIR, "expected.json")
+
+
+# -------------------
+# Analyzers under test
+# -------------------
+def _signal(func, **kwargs):
+    return lambda case: func(y=case["y"], sr=case["sr"], **kwargs)
+
+
+# Chunk length for transcript_chunks: short enough that every signal is cut
+GOLDEN_CHUNK_SECONDS = 2.0
+BURST_THRESHOLD = 0.02
+
+
+def _burst_transcriber(audio, **options):
+    """
+    Deterministic stand-in for Whisper: one word per voiced burst (frame RMS
+    above BURST_THRESHOLD), timestamped like Whisper segments. Chunking is
+    equivalent when stitching the chunks gives the same words and times as
+    transcribing the whole signal, i.e. no cut lands inside speech.
+    """
+    from app.services.analysis.audio_io import frame_rms
+    from app.services.asr import SAMPLE_RATE
+
+    rms, hop = frame_rms(audio, SAMPLE_RATE)
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], (rms > BURST_THRESHOLD).astype(np.int8), [0]])))
+    segments = [{"start": round(float(start * hop / SAMPLE_RATE), 3), "end": round(float(end * hop / SAMPLE_RATE), 3),
+                 "text": "la"} for start, end in zip(edges[::2], edges[1::2])]
+    return {"text": " ".join(seg["text"] for seg in segments), "segments": segments,
+            "language": options.get("language", "en")}
+
+
+def _chunked(chunker):
+    return lambda case: chunker(case["y"], _burst_transcriber, chunk_seconds=GOLDEN_CHUNK_SECONDS)
+
+
+# Rate the production cases are "uploaded" at (browser recordings are 48 kHz),
+# and the rate main.py analyzes at
+UPLOAD_SAMPLE_RATE = 48000
+ANALYSIS_SAMPLE_RATE = 16000
+
+
+def _production(profile_name: str):
+    """
+    A signal through what /analyze-audio does with it before the analyzers
+    see it. The golden signal is held to UPLOAD_SAMPLE_RATE (each sample
+    repeated), wrapped in a 16-bit AudioSegment like a decoded upload, then
+    converted, resampled and normalized by the real stages. The transcript
+    needs Whisper, so only the profile's pause and stress nodes run.
+    """
+    def analyze(case):
+        from pydub import AudioSegment
+        from app.services import analysis_profiles, pipeline
+        from app.services.analysis.audio_io import segment_to_array
+        from app.services.analysis.preprocess import preprocess_audio
+
+        profile = analysis_profiles.get(profile_name)
+        factor = UPLOAD_SAMPLE_RATE // case["sr"]
+        pcm = (np.clip(np.repeat(case["y"], factor), -1.0, 1.0) * 32767).astype("<i2")
+        segment = AudioSegment(pcm.tobytes(), frame_rate=case["sr"] * factor, sample_width=2, channels=1)
+        samples, sr = segment_to_array(segment)
+        y, sr = preprocess_audio(samples, sr=sr, target_sr=ANALYSIS_SAMPLE_RATE)
+        results = pipeline.run({"waveform": (y, sr)}, targets=[profile.analyzers["pause"], profile.analyzers["stress"]],
+                               executor=pipeline.inline)
+        return {profile.slot(name): value for name, value in results.items()}
+    return analyze
+
+
+# Analyzers whose golden outputs come from a different implementation than
+# the one under test (--update records these)
+GOLDEN_SOURCES = {
+    "transcript_chunks": lambda case: _burst_transcriber(case["y"]),
+}
+
+
+def _analyzers():
+    from analysis import audio_features, filler_detection, stress_detection
+    from app.services import asr
+    from app.services.analysis import audio_features as detailed_audio_features
+    from app.services.analysis import filler_detection as detailed_filler_detection
+    from app.services.analysis import stress_detection as detailed_stress_detection
+
+    # name -> (input kind, callable(case) -> output, how to call a variant)
+    return {
+        "pause": ("signals", _signal(audio_features.get_pause_to_speech_ratio), _signal),
+        "stress": ("signals", _signal(stress_detection.analyze_stress), _signal),
+        "filler": ("transcripts",
+                   lambda case: filler_detection.detect_filler_words(transcription={"text": case["text"]}),
+                   lambda f: lambda case: f(transcription={"text": case["text"]})),
+        "pause_silence": ("signals", _signal(detailed_audio_features.get_pause_to_speech_ratio), _signal),
+        "stress_spectral": ("signals", _signal(detailed_stress_detection.analyze_stress), _signal),
+        "filler_fuzzy": ("transcripts",
+                         lambda case: detailed_filler_detection.detect_filler_words(case["text"]),
+                         lambda f: lambda case: f(case["text"])),
+        "transcript_chunks": ("signals", _chunked(asr.transcribe_chunked), _chunked),
+        # variants here replace the whole stage: f(case) -> {"pause": ..., "stress": ...}
+        "pipeline_balanced": ("signals", _production("balanced"), lambda f: f),
+        "pipeline_accurate": ("signals", _production("accurate"), lambda f: f),
+    }
+
+
+# Built-in variants: the slow reference paths kept next to optimized code
+REFERENCE_VARIANTS = {
+    "pause_silence": lambda: _signal(
+        importlib.import_module("app.services.analysis.audio_features").get_pause_to_speech_ratio,
+        reference=True),
+}
+
+
+def load_variant(name: str, spec: str, adapter):
+    if spec == "reference":
+        if name not in REFERENCE_VARIANTS:
+            raise SystemExit(f"No built-in reference variant for {name!r}")
+        return REFERENCE_VARIANTS[name]()
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise SystemExit(f"--variant {name}={spec}: expected module:function")
+    return adapter(getattr(importlib.import_module(module_name), attr))
+
+
+# -------------------
+# Corpus
+# -------------------
+def _voiced(t, f0, sr, rng, harmonics=6):
+    """Harmonic stack with slight pitch jitter and a speech-like spectral tilt."""
+    phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.01 * rng.standard_normal(t.size))) / sr
+    return sum(np.sin(k * phase) / k for k in range(1, harmonics + 1))
+
+
+def _syllables(t, sr, rate_hz, duty, rng):
+    """Syllable-rate amplitude envelope (0..1) with random accents."""
+    env = np.clip(np.sin(2 * np.pi * rate_hz * t + rng.uniform(0, np.pi)), 0, None) ** 0.7
+    accents = np.repeat(rng.uniform(0.5, 1.0, int(np.ceil(t[-1] * rate_hz)) + 2), int(sr / rate_hz) + 1)
+    return env * accents[:t.size] * (env > 1 - duty)
+
+
+def synthesize_corpus(sr: int, seed: int = 0) -> dict:
+    """Deterministic reference signals, name -> (samples, description)."""
+    rng = np.random.default_rng(seed)
+
+    def t_of(seconds):
+        return np.arange(int(sr * seconds)) / sr
+
+    def speech(seconds, f0=140.0, f0_swing=15.0, rate=4.0, duty=0.9, level=0.3):
+        t = t_of(seconds)
+        f0_track = f0 + f0_swing * np.sin(2 * np.pi * 0.7 * t) + f0_swing * 0.5 * np.sin(2 * np.pi * 2.3 * t)
+        return level * _voiced(t, f0_track, sr, rng) * _syllables(t, sr, rate, duty, rng) / 2
+
+    def pause(seconds, floor=0.0005):
+        return floor * rng.standard_normal(int(sr * seconds))
+
+    signals = {}
+    signals["speech_with_pauses"] = (np.concatenate([
+        speech(1.2), pause(0.7), speech(0.9, f0=150), pause(1.1), speech(1.5, f0=130), pause(0.3), speech(0.6)]),
+        "voiced phrases separated by 0.3-1.1 s pauses")
+    signals["continuous_speech"] = (speech(4.0, f0=120), "four seconds of speech, no pause over 0.5 s")
+    signals["long_pause"] = (np.concatenate([speech(1.0), pause(3.0), speech(1.0)]),
+                             "a single 3 s pause between two phrases")
+    signals["digital_silence"] = (np.zeros(int(sr * 2.0)), "all-zero samples")
+    noisy = np.concatenate([speech(1.5), pause(0.8), speech(1.5)])
+    signals["noisy_room"] = (noisy + 0.02 * np.cumsum(rng.standard_normal(noisy.size)) / np.sqrt(sr / 50),
+                             "speech and pause under brown-ish background noise")
+    signals["stressed_speech"] = (
+        speech(3.5, f0=210, f0_swing=60, rate=6.0, level=0.5) * (1 + 0.3 * rng.standard_normal(int(sr * 3.5))),
+        "fast, high and widely varying pitch with shimmer")
+    signals["monotone_tone"] = (0.2 * np.sin(2 * np.pi * 220 * t_of(3.0)), "steady 220 Hz tone")
+    signals["short_clip"] = (speech(0.3), "0.3 s, shorter than the minimum pause length")
+
+    out = {}
+    for name, (y, description) in signals.items():
+        out[name] = (np.clip(y, -0.99, 0.99).astype(np.float32), description)
+    return out
+
+
+def write_corpus(manifest: dict):
+    sr = manifest["sample_rate"]
+    os.makedirs(os.path.join(GOLDEN_DIR, "signals"), exist_ok=True)
+    manifest["signals"] = {}
+    for name, (y, description) in synthesize_corpus(sr, manifest.get("seed", 0)).items():
+        rel = f"signals/{name}.flac"
+        sf.write(os.path.join(GOLDEN_DIR, rel), y, sr, format="FLAC", subtype="PCM_16")
+        manifest["signals"][name] = {"file": rel, "description": description}
+
+
+def load_cases(manifest: dict) -> dict:
+    cases = {"signals": {}, "transcripts": {}}
+    for name, entry in manifest["signals"].items():
+        y, sr = sf.read(os.path.join(GOLDEN_DIR, entry["file"]), dtype="float32")
+        cases["signals"][name] = {"y": y, "sr": sr}
+    for name, text in manifest["transcripts"].items():
+        cases["transcripts"][name] = {"text": text}
+    return cases
+
+
+# -------------------
+# Comparison
+# -------------------
+def _tolerance(tolerances: dict, analyzer: str, path: str) -> dict:
+    tol = dict(tolerances.get("default", {}))
+    tol.update(tolerances.get(analyzer, {}).get(re.sub(r"\[\d+\]", "[]", path), {}))  # list items share one
+    return tol
+
+
+def compare(expected, actual, analyzer: str, tolerances: dict, path: str = "") -> list:
+    """Differences as dicts {path, expected, actual, ...}; [] if equivalent."""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        diffs = []
+        for key in sorted(set(expected) | set(actual), key=str):
+            sub = f"{path}.{key}" if path else str(key)
+            if key not in actual:
+                diffs.append({"path": sub, "problem": "missing", "expected": expected[key]})
+            elif key not in expected:
+                diffs.append({"path": sub, "problem": "unexpected", "actual": actual[key]})
+            else:
+                diffs += compare(expected[key], actual[key], analyzer, tolerances, sub)
+        return diffs
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [{"path": path, "problem": "length", "expected": len(expected), "actual": len(actual)}]
+        diffs = []
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            diffs += compare(e, a, analyzer, tolerances, f"{path}[{i}]")
+        return diffs
+    numeric = (int, float)
+    if isinstance(expected, numeric) and isinstance(actual, numeric) \
+            and not isinstance(expected, bool) and not isinstance(actual, bool):
+        if math.isnan(expected) and math.isnan(actual):
+            return []
+        tol = _tolerance(tolerances, analyzer, path)
+        allowed = tol.get("abs", 0.0) + tol.get("rel", 0.0) * abs(expected)
+        delta = abs(actual - expected)
+        if delta <= allowed:
+            return []
+        return [{"path": path, "problem": "tolerance", "expected": expected, "actual": actual,
+                 "delta": delta, "allowed": allowed}]
+    if expected != actual:
+        return [{"path": path, "problem": "value", "expected": expected, "actual": actual}]
+    return []
+
+
+def _jsonable(value):
+    """Analyzer output as it is stored (JSON column): numpy scalars to Python."""
+    return json.loads(json.dumps(value, default=lambda o: o.item() if hasattr(o, "item") else str(o)))
+
+
+def run(analyzers: dict, selected, variants: dict, cases: dict, golden: dict, tolerances: dict,
+        skip: dict = None) -> dict:
+    report = {}
+    skip = skip or {}
+    for name in selected:
+        kind, reference, adapter = analyzers[name]
+        func = load_variant(name, variants[name], adapter) if name in variants else reference
+        results = {}
+        for case_name, case in cases[kind].items():
+            if case_name in skip.get(name, {}):
+                continue
+            actual = _jsonable(func(case))
+            if case_name not in golden.get(name, {}):
+                results[case_name] = {"status": "no_golden", "actual": actual}
+                continue
+            diffs = compare(golden[name][case_name], actual, name, tolerances)
+            results[case_name] = {"status": "ok" if not diffs else "diff", "diffs": diffs}
+        report[name] = {"variant": variants.get(name, "current"), "cases": results,
+                        "skipped": skip.get(name, {})}
+    return report
+
+
+def print_report(report: dict) -> bool:
+    passed = True
+    for name, entry in report.items():
+        cases = entry["cases"]
+        bad = {c: r for c, r in cases.items() if r["status"] != "ok"}
+        print(f"{name} [{entry['variant']}]: {len(cases) - len(bad)}/{len(cases)} cases equivalent")
+        for case_name, reason in entry.get("skipped", {}).items():
+            print(f"  {case_name}: skipped ({reason})")
+        for case_name, result in bad.items():
+            passed = False
+            if result["status"] == "no_golden":
+                print(f"  {case_name}: no golden output (run with --update)")
+                continue
+            for diff in result["diffs"]:
+                detail = ", ".join(f"{k}={v!r}" for k, v in diff.items() if k not in ("path", "problem"))
+                print(f"  {case_name}: {diff['path'] or '<root>'} {diff['problem']}: {detail}")
+    print("PASS" if passed else "FAIL")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyzers", default=None, help="comma-separated analyzer names (default: all)")
+    parser.add_argument("--variant", action="append", default=[], metavar="NAME=module:function",
+                        help="check this implementation against NAME's golden outputs ('reference' for built-ins)")
+    parser.add_argument("--report", default=None, help="also write the diff report as JSON here")
+    parser.add_argument("--update", action="store_true", help="overwrite golden outputs with current results")
+    parser.add_argument("--regenerate-corpus", action="store_true", help="re-synthesize golden/signals")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    with open(MANIFEST) as f:
+        manifest = json.load(f)
+    if args.regenerate_corpus:
+        write_corpus(manifest)
+        with open(MANIFEST, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+
+    analyzers = _analyzers()
+    selected = args.analyzers.split(",") if args.analyzers else list(analyzers)
+    unknown = [name for name in selected if name not in analyzers]
+    variants = dict(spec.split("=", 1) for spec in args.variant)
+    unknown += [name for name in variants if name not in analyzers]
+    if unknown:
+        parser.error(f"unknown analyzers {unknown}; choose from {sorted(analyzers)}")
+    for name in variants:
+        if name not in selected:
+            selected.append(name)
+
+    cases = load_cases(manifest)
+    golden = {}
+    if os.path.exists(EXPECTED):
+        with open(EXPECTED) as f:
+            golden = json.load(f)
+
+    if args.update:
+        if variants:
+            parser.error("--update records the current implementations; drop --variant")
+        for name in selected:
+            kind, reference, _ = analyzers[name]
+            reference = GOLDEN_SOURCES.get(name, reference)
+            skipped = manifest.get("skip", {}).get(name, {})
+            golden[name] = {case_name: _jsonable(reference(case)) for case_name, case in cases[kind].items()
+                            if case_name not in skipped}
+        with open(EXPECTED, "w") as f:
+            json.dump(golden, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Updated golden outputs for {', '.join(selected)}")
+
+    report = run(analyzers, selected, variants, cases, golden, manifest.get("tolerances", {}),
+                 manifest.get("skip", {}))
+    passed = print_report(report)
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+End-to-end load test: how many concurrent candidates can one node serve?
+
+Starts the API in-process (uvicorn on a free local port) against a
+throwaway SQLite database in a temp directory, replaces Whisper with a
+deterministic fake ASR, and replays candidate sessions from --concurrency
+client threads:
+
+    register -> login -> POST /questions -> repeat --answers times:
+        upload a recorded answer to /analyze-audio, poll /my-analyses
+
+Answers are the recordings in --audio-dir (default uploads/*.webm, which
+have varying lengths; decoding them needs ffmpeg like the real server).
+The fake ASR sleeps --asr-latency-ms + --asr-rtf x audio seconds, so the
+Whisper cost can be dialled in without a model.
+
+Prints per-endpoint request counts, error rates, throughput and p50/p95/p99
+latency, plus the status-code mix (503 = shed by admission control).
+
+Usage:
+    python load_test.py --concurrency 8 --users 32 --answers 3
+    python load_test.py --concurrency 32 --asr-rtf 0.3 --asr-latency-ms 200
+"""
+import argparse
+import glob
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+FAKE_ANSWERS = [
+    "um so i think the main challenge was scaling the database, like, basically we sharded it",
+    "well i would start by reproducing the issue and then i would check the metrics",
+    "actually the team disagreed at first but we ran an experiment and you know it worked",
+    "i led the migration and right so the hardest part was keeping the old api running",
+]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, seconds: float, status):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+
+
+def install_fake_asr(latency_ms: float, rtf: float):
+    """Deterministic stand-in for Whisper (no model load, no weights)."""
+    from app.services import asr
+
+    def transcribe(audio, model_name=None, **options):
+        seconds = len(audio) / asr.SAMPLE_RATE if not isinstance(audio, str) else 5.0
+        time.sleep(latency_ms / 1000.0 + rtf * seconds)
+        text = FAKE_ANSWERS[int(seconds * 10) % len(FAKE_ANSWERS)]
+        return {"text": text, "segments": [], "language": "en"}
+
+    asr.transcribe = transcribe
+    asr.load_local_model = lambda model_name=None: None
+    asr.server_available = lambda: False
+
+
+def start_server(port: int):
+    import uvicorn
+    import main
+
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("server did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def candidate_session(base: str, clips: list, args, recorder: Recorder, rng):
+    http = requests.Session()
+
+    def call(endpoint, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            res = http.request(method, base + path, timeout=args.timeout, **kwargs)
+            status = res.status_code
+        except requests.RequestException as e:
+            res, status = None, type(e).__name__
+        recorder.record(endpoint, time.perf_counter() - start, status)
+        return res
+
+    email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+    password = "loadtest-password"
+    call("POST /auth/register", "POST", "/auth/register",
+         json={"email": email, "password": password, "full_name": "Load Test"})
+    res = call("POST /auth/login", "POST", "/auth/login", data={"username": email, "password": password})
+    if res is None or res.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {res.json()['access_token']}"}
+    call("POST /questions", "POST", "/questions", headers=headers,
+         json={"job_role": rng.choice(["Backend Engineer", "Data Scientist"]), "company_name": "Acme"})
+
+    for _ in range(args.answers):
+        name, payload = clips[rng.integers(len(clips))]
+        call("POST /analyze-audio", "POST", "/analyze-audio", headers=headers,
+             files={"file": (name, payload, "audio/webm")})
+        call("GET /my-analyses", "GET", "/my-analyses", headers=headers)
+        if args.think_ms:
+            time.sleep(args.think_ms / 1000.0)
+
+
+def report(recorder: Recorder, elapsed: float):
+    print(f"\n{'endpoint':<22} {'count':>6} {'err %':>6} {'req/s':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for endpoint in sorted(recorder.latencies):
+        lat = np.array(recorder.latencies[endpoint]) * 1000
+        statuses = recorder.statuses[endpoint]
+        errors = sum(n for s, n in statuses.items() if not (isinstance(s, int) and s < 400))
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        mix = " ".join(f"{s}:{n}" for s, n in sorted(statuses.items(), key=lambda kv: str(kv[0])))
+        print(f"{endpoint:<22} {len(lat):6d} {100 * errors / len(lat):6.1f} {len(lat) / elapsed:7.2f} "
+              f"{p50:8.0f} {p95:8.0f} {p99:8.0f}  {mix}")
+    total = sum(len(v) for v in recorder.latencies.values())
+    print(f"\n{total} requests in {elapsed:.1f} s ({total / elapsed:.1f} req/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="simultaneous candidates")
+    parser.add_argument("--users", type=int, default=None, help="total candidate sessions (default: 4 x concurrency)")
+    parser.add_argument("--answers", type=int, default=3, help="answers uploaded per candidate")
+    parser.add_argument("--audio-dir", default=os.path.join(current_dir, "uploads"))
+    parser.add_argument("--asr-latency-ms", type=float, default=50.0)
+    parser.add_argument("--asr-rtf", type=float, default=0.1, help="fake ASR seconds per audio second")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between answers")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    clips = []
+    for path in sorted(glob.glob(os.path.join(os.path.abspath(args.audio_dir), "*.webm"))):
+        with open(path, "rb") as f:
+            clips.append((os.path.basename(path), f.read()))
+    if not clips:
+        parser.error(f"no .webm recordings in {args.audio_dir}")
+
+    # Fresh database / upload dir; the stub question generator keeps it offline
+    workdir = tempfile.mkdtemp(prefix="virtuhire-load-")
+    os.chdir(workdir)
+    os.environ.setdefault("QUESTION_GENERATOR", "stub")
+    install_fake_asr(args.asr_latency_ms, args.asr_rtf)
+    port = free_port()
+    server, thread = start_server(port)
+    base = f"http://127.0.0.1:{port}"
+
+    users = args.users or 4 * args.concurrency
+    print(f"{users} candidates x {args.answers} answers, concurrency {args.concurrency}, "
+          f"{len(clips)} recordings, fake ASR {args.asr_latency_ms:g} ms + {args.asr_rtf:g} x audio")
+
+    recorder = Recorder()
+    remaining = {"n": users}
+    lock = threading.Lock()
+
+    def client(index):
+        rng = np.random.default_rng(args.seed + index)
+        while True:
+            with lock:
+                if remaining["n"] == 0:
+                    return
+                remaining["n"] -= 1
+            candidate_session(base, clips, args, recorder, rng)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(args.concurrency)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    report(recorder, elapsed)
+    server.should_exit = True
+    thread.join(timeout=10)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
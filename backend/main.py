@@ -1,24 +1,33 @@
-from fastapi import FastAPI, File, UploadFile, Depends, HTTPException
+from fastapi import FastAPI, File, UploadFile, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import Optional
+import asyncio
+import json
 import os
+import time
 import uuid
 from pydub import AudioSegment
-import whisper
 
-from database import Base, engine, SessionLocal
+from database import Base, engine, SessionLocal, add_missing_columns
 import models
-from routers import auth, profile
+from routers import auth, profile, analyses, admin, questions, uploads
 from routers.auth import get_current_user
-from analysis.filler_detection import detect_filler_words
-from analysis.audio_features import get_pause_to_speech_ratio
-from analysis.stress_detection import analyze_stress
+from app.services import (admission, analysis_profiles, asr, audio_store, cancellation, feature_tracks, metrics,
+                          pipeline, profiling, transcript_search, upload_sessions, write_behind)
+from app.services.analysis import audio_io
+from app.services.analysis.audio_io import segment_to_array
+from app.services.analysis.preprocess import preprocess_audio
 
 # -------------------
 # DB Init
 # -------------------
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, models.AudioAnalysis.__table__)
+transcript_search.install(engine)  # full-text index on transcriptions
 
 # -------------------
 # FastAPI App
@@ -45,6 +54,11 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of per-stage latency, counters and gauges."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # -------------------
 # Allow frontend requests (CORS)
 # -------------------
@@ -62,6 +76,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 # -------------------
 # Register Routers (IMPORTANT)
@@ -69,6 +84,10 @@ app.add_middleware(
 # ✅ Do not duplicate include_router() — just include once
 app.include_router(auth.router)     # Has prefix="/auth"
 app.include_router(profile.router)  # Has prefix="/profile"
+app.include_router(analyses.router) # Has prefix="/analyses"
+app.include_router(admin.router)    # Has prefix="/admin"
+app.include_router(questions.router) # Has prefix="/questions"
+app.include_router(uploads.router)   # Has prefix="/uploads" (finalize is below)
 
 # -------------------
 # Audio Analysis Setup
@@ -76,7 +95,25 @@ app.include_router(profile.router)  # Has prefix="/profile"
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-whisper_model = whisper.load_model("base")
+# Preprocessing runs in memory at 16 kHz (whisper's rate) before every analyzer
+ANALYSIS_SAMPLE_RATE = 16000
+PREPROCESS_DENOISE = os.getenv("PREPROCESS_DENOISE", "1") == "1"
+
+@app.on_event("startup")
+def warm_up_asr():
+    # With a local model server (model_server.py) the weights live there once
+    # per node; otherwise load them here so the first request doesn't pay for it.
+    if not asr.server_available():
+        asr.load_local_model()
+
+@app.on_event("startup")
+def clean_upload_sessions():
+    upload_sessions.cleanup_expired()
+
+@app.on_event("shutdown")
+def flush_results():
+    # Commit whatever the write-behind persister still holds
+    write_behind.persister.close()
 
 def get_db():
     db = SessionLocal()
@@ -85,69 +122,455 @@ def get_db():
     finally:
         db.close()
 
+def _profile_request(profile: Optional[str], latency_budget_ms: Optional[float]):
+    """Validate the profile / budget query params before taking an analysis slot."""
+    if profile:
+        try:
+            analysis_profiles.get(profile)
+        except analysis_profiles.UnknownProfile as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if latency_budget_ms is not None and latency_budget_ms <= 0:
+        raise HTTPException(status_code=400, detail="latency_budget_ms must be positive")
+    return profile, latency_budget_ms
+
+UPLOAD_FORMATS = ("webm",) + tuple(audio_io.RAW_PCM_FORMATS) + ("opus",)
+
+def _audio_format(format: str, sample_rate: Optional[int], channels: int):
+    """
+    None for container uploads (decoded by pydub/ffmpeg), else the declared
+    raw format, which is loaded straight into a numpy buffer.
+    """
+    if format not in UPLOAD_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(UPLOAD_FORMATS)}")
+    if format == "webm":
+        return None
+    if not sample_rate:
+        raise HTTPException(status_code=400, detail=f"sample_rate is required for format={format}")
+    if format == "opus":
+        if audio_io.opuslib is None:
+            raise HTTPException(status_code=415, detail="Opus uploads are not supported on this server (opuslib missing)")
+        if sample_rate not in audio_io.OPUS_SAMPLE_RATES:
+            raise HTTPException(status_code=400, detail=f"Opus sample_rate must be one of {list(audio_io.OPUS_SAMPLE_RATES)}")
+    return {"format": format, "sample_rate": sample_rate, "channels": channels}
+
+def _decode_raw(data, audio_format):
+    if audio_format["format"] == "opus":
+        return audio_io.decode_opus_frames(data, audio_format["sample_rate"], audio_format["channels"])
+    return audio_io.decode_pcm(data, audio_format["format"], audio_format["sample_rate"], audio_format["channels"])
+
+@app.get("/analyze-audio/profiles")
+async def get_analysis_profiles():
+    """Analysis profiles with their settings and measured cost (seconds per audio second)."""
+    return analysis_profiles.report()
+
 # -------------------
 # Protected Audio Endpoint
 # -------------------
 @app.post("/analyze-audio")
 async def analyze_audio(
+    request: Request,
+    response: Response,
     file: UploadFile = File(...),
+    profile: Optional[str] = Query(None, description="fast, balanced or accurate"),
+    latency_budget_ms: Optional[float] = Query(None, description="pick the most accurate profile that fits"),
+    format: str = Query("webm", description="webm, pcm_f32le, pcm_s16le or opus (length-prefixed packets)"),
+    sample_rate: Optional[int] = Query(None, gt=0, description="required for raw formats"),
+    channels: int = Query(1, ge=1, le=8, description="interleaved channels for raw formats"),
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    profile_request = _profile_request(profile, latency_budget_ms)
+    audio_format = _audio_format(format, sample_rate, channels)
     file_id = str(uuid.uuid4())
     input_path = os.path.join(UPLOAD_DIR, f"{file_id}.webm")
-    output_path = os.path.join(UPLOAD_DIR, f"{file_id}.wav")
 
+    async def save_upload():
+        with profiling.stage("save_upload"):
+            data = await file.read()
+            if audio_format is not None:
+                return data  # raw samples: decoded from memory, never written to disk
+            with open(input_path, "wb") as f:
+                f.write(data)
+
+    try:
+        return await _admit_and_analyze(request, response, input_path, file_id, current_user, db,
+                                        profile_request, before=save_upload, audio_format=audio_format)
+    finally:
+        # Cleanup temporary upload
+        if os.path.exists(input_path):
+            os.remove(input_path)
+
+async def _admit_and_analyze(request, response, input_path, file_id, current_user, db,
+                             profile_request, before=None, audio_format=None):
+    """
+    Run the analysis in an admission slot. `before` (async) runs once the
+    slot is held; if it returns bytes they are analyzed instead of input_path.
+    """
+    profiler = None
+    watcher = None
+    status = "error"
+    cancel = cancellation.CancelToken()  # deadline counts from arrival, queueing included
     try:
-        # Save uploaded file
-        with open(input_path, "wb") as f:
-            f.write(await file.read())
+        # Bounded admission: fail fast with 503 instead of slowing everyone down
+        async with admission.analysis_admission.slot() as queue_wait:
+            response.headers["X-Queue-Wait-Ms"] = str(int(queue_wait * 1000))
+            data = await before() if before is not None else None
 
-        # Convert to .wav
+            # Stop early if the client goes away (only safe once the body has been read)
+            watcher = asyncio.ensure_future(cancellation.watch_disconnect(request, cancel))
+            # Opt-in CPU / memory profiling (admin-enabled, see app/services/profiling.py)
+            profiler = profiling.profiler_for(request, file_id)
+            with metrics.IN_FLIGHT.track_inprogress():
+                # CPU-bound work runs off the event loop so the slots really run in parallel
+                result = await run_in_threadpool(
+                    _run_analysis, input_path, file_id, current_user, db, profiler,
+                    profile_request=profile_request, audio_format=audio_format, data=data, cancel=cancel
+                )
+        status = "ok"
+        return result
+
+    except admission.Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Analysis capacity exhausted ({e.reason}), retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except cancellation.Cancelled as e:
+        db.rollback()
+        status = "cancelled"
+        raise _cancelled_error(e)
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if profiler is not None:
+            profiler.finish(status)
+
+def _cancelled_error(e: cancellation.Cancelled) -> HTTPException:
+    # 499 (client closed request) is only ever seen in logs; the client is gone
+    return HTTPException(status_code=504 if e.reason == "deadline" else 499, detail=str(e))
+
+# -------------------
+# Resumable uploads: analyze once every chunk has arrived (routers/uploads.py)
+# -------------------
+@app.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    total_size: Optional[int] = Query(None, gt=0, description="required if not declared at creation"),
+    profile: Optional[str] = Query(None, description="fast, balanced or accurate"),
+    latency_budget_ms: Optional[float] = Query(None, description="pick the most accurate profile that fits"),
+    format: str = Query("webm", description="webm, pcm_f32le, pcm_s16le or opus (length-prefixed packets)"),
+    sample_rate: Optional[int] = Query(None, gt=0, description="required for raw formats"),
+    channels: int = Query(1, ge=1, le=8, description="interleaved channels for raw formats"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Analyze a completed upload session; answers like /analyze-audio.
+    409 lists the byte ranges still missing, or reports that another finalize
+    is running. The session is kept when the analysis can be retried
+    (503 / 500) and removed otherwise.
+    """
+    profile_request = _profile_request(profile, latency_budget_ms)
+    audio_format = _audio_format(format, sample_rate, channels)
+    try:
+        input_path = upload_sessions.assembled_path(upload_id, current_user.id, total_size)
+    except upload_sessions.UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    except upload_sessions.UploadIncomplete as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "missing": e.missing})
+    except upload_sessions.InvalidChunk as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except upload_sessions.UploadBusy as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "missing": []})
+
+    try:
+        result = await _admit_and_analyze(request, response, input_path, str(uuid.uuid4()), current_user, db,
+                                          profile_request, audio_format=audio_format)
+    except HTTPException as e:
+        if e.status_code == 400:
+            upload_sessions.delete(upload_id)  # undecodable audio: a retry can't succeed
+        else:
+            upload_sessions.release(upload_id, current_user.id)
+        raise
+    except BaseException:
+        upload_sessions.release(upload_id, current_user.id)
+        raise
+    upload_sessions.delete(upload_id)
+    return result
+
+# -------------------
+# Streaming variant: Server-Sent Events as each stage finishes
+# -------------------
+_stream_tasks = set()  # keep running analyses referenced after a client disconnects
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/analyze-audio/stream")
+async def analyze_audio_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    profile: Optional[str] = Query(None, description="fast, balanced or accurate"),
+    latency_budget_ms: Optional[float] = Query(None, description="pick the most accurate profile that fits"),
+    format: str = Query("webm", description="webm, pcm_f32le, pcm_s16le or opus (length-prefixed packets)"),
+    sample_rate: Optional[int] = Query(None, gt=0, description="required for raw formats"),
+    channels: int = Query(1, ge=1, le=8, description="interleaved channels for raw formats"),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Same analysis as /analyze-audio, answered as text/event-stream: one event
+    per finished stage (convert, profile, preprocess, pause, stress,
+    transcript, filler), then `done` with the full result or `error`.
+    """
+    profile_request = _profile_request(profile, latency_budget_ms)
+    audio_format = _audio_format(format, sample_rate, channels)
+    file_id = str(uuid.uuid4())
+    input_path = os.path.join(UPLOAD_DIR, f"{file_id}.webm")
+    cancel = cancellation.CancelToken()
+    controller = admission.analysis_admission
+    try:
+        queue_wait = await controller.acquire()
+    except admission.Overloaded as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Analysis capacity exhausted ({e.reason}), retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    started = time.perf_counter()
+    data = None
+    try:
+        with profiling.stage("save_upload"):
+            data = await file.read()
+            if audio_format is None:
+                with open(input_path, "wb") as f:
+                    f.write(data)
+                data = None
+    except BaseException:
+        controller.release(time.perf_counter() - started)
+        if os.path.exists(input_path):
+            os.remove(input_path)
+        raise
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    profiler = profiling.profiler_for(request, file_id)
+
+    def emit(event, data=None):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    def work():
+        # The request's DB session is closed before a streamed body runs
+        db = SessionLocal()
+        status = "error"
         try:
-            audio = AudioSegment.from_file(input_path, format="webm")
-            audio.export(output_path, format="wav")
+            with metrics.IN_FLIGHT.track_inprogress():
+                result = _run_analysis(input_path, file_id, current_user, db, profiler, emit=emit,
+                                       profile_request=profile_request, audio_format=audio_format, data=data,
+                                       cancel=cancel)
+            status = "ok"
+            emit("done", result)
+        except cancellation.Cancelled as e:
+            db.rollback()
+            status = "cancelled"
+            error = _cancelled_error(e)
+            emit("error", {"status": error.status_code, "detail": error.detail})
+        except HTTPException as e:
+            db.rollback()
+            emit("error", {"status": e.status_code, "detail": e.detail})
         except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Audio conversion failed: {str(e)}")
+            db.rollback()
+            emit("error", {"status": 500, "detail": str(e)})
+        finally:
+            db.close()
+            if profiler is not None:
+                profiler.finish(status)
+            if os.path.exists(input_path):
+                os.remove(input_path)
+            emit(None)
+
+    # The slot is held until the analysis itself ends; if the client leaves early
+    # the token makes it stop at the next stage / pipeline node / ASR chunk
+    task = asyncio.ensure_future(run_in_threadpool(work))
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+    task.add_done_callback(lambda _: controller.release(time.perf_counter() - started))
+
+    async def event_stream():
+        finished = False
+        try:
+            yield _sse("queued", {"file_id": file_id, "queue_wait_ms": int(queue_wait * 1000)})
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(events.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    finished = True
+                    return
+                yield _sse(event, data)
+        finally:
+            # Closed before the analysis ended: the client disconnected
+            if not finished:
+                cancel.cancel("client_disconnect")
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "X-Queue-Wait-Ms": str(int(queue_wait * 1000)),
+    })
+
+def _stage_event(emit, name, value):
+    """Forward finished pipeline nodes to `emit`, shaped like the final response."""
+    if name == "transcript":
+        emit("transcript", {"text": value.get("text", "")})
+    elif name == "filler":
+        emit("filler", {"filler_words": list(value.get("filler_words", {}).keys()),
+                        "total_count": value.get("total_count", 0)})
+    elif name in pipeline.analyzers():
+        emit(name, value)
 
-        # Run analyses
-        pause_result = get_pause_to_speech_ratio(output_path)
-        filler_result = detect_filler_words(output_path)
-        stress_result = analyze_stress(output_path)
+def _run_analysis(input_path, file_id, current_user, db, profiler=None, emit=None, profile_request=(None, None),
+                  audio_format=None, data=None, cancel=None):
+    if profiler is not None:
+        profiler.start()
+    try:
+        return _analyze_file(input_path, file_id, current_user, db, profiler, emit, profile_request,
+                             audio_format, data, cancel)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+def _analyze_file(input_path, file_id, current_user, db, profiler, emit=None, profile_request=(None, None),
+                  audio_format=None, data=None, cancel=None):
+    # `cancel` (cancellation.CancelToken) is checked before each stage
+    if cancel is not None:
+        cancel.check("convert")
+    # Decode the upload straight into a float32 buffer (no .wav round trip);
+    # raw PCM / Opus uploads skip the container and ffmpeg entirely
+    try:
+        with profiling.stage("convert", profiler):
+            if audio_format is None:
+                audio = AudioSegment.from_file(input_path, format="webm")
+                samples, sample_rate = segment_to_array(audio)
+                del audio
+            else:
+                if data is None:
+                    with open(input_path, "rb") as f:
+                        data = f.read()
+                samples, sample_rate = _decode_raw(data, audio_format)
+            if not len(samples):
+                raise ValueError("no audio samples")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Audio conversion failed: {str(e)}")
+    duration = len(samples) / sample_rate
+    if emit is not None:
+        emit("convert", {"duration_s": round(duration, 3), "sample_rate": sample_rate})
+
+    # Profile (app/services/analysis_profiles.py): named, or the most accurate that fits the budget
+    profile, reason = analysis_profiles.choose(*profile_request, audio_seconds=duration)
+    predicted = analysis_profiles.predict_seconds(profile.name, duration)
+    if emit is not None:
+        emit("profile", {"name": profile.name, "reason": reason, "predicted_s": round(predicted, 3)})
+
+    # Keep a lossless copy + 16 kHz float32 cache for re-analysis (AUDIO_STORE_DIR). The
+    # resample doubles as the analysis input; storing waits until the result is saved
+    to_store = None
+    if audio_store.enabled():
+        with profiling.stage("resample", profiler):
+            y16 = audio_store.to_cache_rate(samples, sample_rate)
+        to_store = (samples, sample_rate, y16)
+        samples, sample_rate = y16, audio_store.CACHE_SAMPLE_RATE
+
+    # Resample to 16 kHz and normalize in memory; denoise / pre-emphasis only feed the transcript
+    if cancel is not None:
+        cancel.check("preprocess")
+    analysis_started = time.perf_counter()
+    with profiling.stage("preprocess", profiler):
+        y, sr = preprocess_audio(samples, sr=sample_rate, target_sr=ANALYSIS_SAMPLE_RATE)
+        del samples, data
+    if emit is not None:
+        emit("preprocess", {"sample_rate": sr})
+
+    # Run the profile's analyzers plus any other registered ones (app/services/pipeline.py);
+    # shared intermediates are computed once and independent nodes run concurrently
+    tracks = {}
+    targets = profile.targets() + [name for name in pipeline.analyzers() if name not in profile.analyzers]
+    results = pipeline.run(
+        {"waveform": (y, sr), "tracks": tracks, "asr_options": profile.asr_options(),
+         "speech_options": {"denoise": PREPROCESS_DENOISE and profile.denoise}, "cancel": cancel},
+        targets=targets,
+        stage=lambda name: profiling.stage(name, profiler),
+        # Profiled requests run the nodes on this thread so cProfile and the per-stage peaks see them
+        executor=pipeline.inline if profiler is not None else None,
+        on_result=(lambda name, value: _stage_event(emit, profile.slot(name), value)) if emit is not None else None,
+    )
+    results = {profile.slot(name): value for name, value in results.items()}
+    analysis_seconds = time.perf_counter() - analysis_started
+    analysis_profiles.record(profile.name, analysis_seconds, duration)
+    pause_result = results.pop("pause")
+    filler_result = results.pop("filler")
+    stress_result = results.pop("stress")
 
-        transcript_text = filler_result.get("transcription", "")
-        filler_words = list(filler_result.get("filler_words", {}).keys())
+    transcript_text = filler_result.get("transcription", "")
+    filler_words = list(filler_result.get("filler_words", {}).keys())
 
-        # Save to DB
+    # Save to DB
+    with profiling.stage("db_commit", profiler):
         analysis_record = models.AudioAnalysis(
             file_id=file_id,
             transcription=transcript_text,
             pause_to_speech_analysis=pause_result,
             filler_word_analysis=filler_result,
             stress_analysis=stress_result,
+            analysis_profile=profile.name,
             user_id=current_user.id
         )
-        db.add(analysis_record)
-        db.commit()
-
-        return {
-            "message": "Audio processed and saved",
-            "file_id": file_id,
-            "user_email": current_user.email,
-            "pause_to_speech_analysis": pause_result,
-            "filler_word_analysis": {"filler_words": filler_words},
-            "stress_analysis": stress_result,
-            "transcription": transcript_text
-        }
+        analysis_record.tracks = feature_tracks.to_rows(tracks)
+        if write_behind.enabled():
+            # Grouped with concurrent results; returns once the commit is durable
+            try:
+                write_behind.persister.save(analysis_record)
+            except write_behind.PersistTimeout as e:
+                # Withdrawn, so nothing was stored and a retry can't duplicate it
+                raise HTTPException(status_code=503, detail=f"Could not save the analysis ({e}), retry later",
+                                    headers={"Retry-After": "5"})
+        else:
+            db.add(analysis_record)
+            db.commit()
 
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Cleanup temporary files
-        for path in [input_path, output_path]:
-            if os.path.exists(path):
-                os.remove(path)
+    # Only analyses that were saved get a stored copy, so no object or ref is left without a row
+    if to_store is not None:
+        samples, sample_rate, y16 = to_store
+        del to_store
+        try:
+            with profiling.stage("store_audio", profiler):
+                audio_store.put(file_id, samples, sample_rate, y16=y16)
+        except OSError as e:
+            print(f"Audio store write failed for {file_id}: {e}")
+        del samples, y16
+
+    return {
+        "message": "Audio processed and saved",
+        "file_id": file_id,
+        "user_email": current_user.email,
+        "pause_to_speech_analysis": pause_result,
+        "filler_word_analysis": {"filler_words": filler_words},
+        "stress_analysis": stress_result,
+        "transcription": transcript_text,
+        "analysis_profile": {"name": profile.name, "reason": reason,
+                             "predicted_s": round(predicted, 3), "measured_s": round(analysis_seconds, 3)},
+        # Analyzers without a column of their own are returned, not stored
+        **({"additional_analyses": results} if results else {})
+    }
 
 # -------------------
 # Fetch analyses for logged-in user
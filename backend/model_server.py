@@ -0,0 +1,171 @@
+"""
+Local inference server for VirtuHire.
+
+Holds the Whisper model(s) once per node and serves transcription to every
+uvicorn worker over a Unix domain socket, instead of each worker loading its
+own copy. Workers find it through MODEL_SERVER_SOCKET and fall back to
+in-process loading when it is not running (see app/services/asr.py).
+
+Usage:
+    python model_server.py --models base --concurrency 1
+    MODEL_SERVER_SOCKET=/tmp/virtuhire-asr.sock uvicorn main:app --workers 4
+
+--concurrency is the number of model replicas per model. Whisper decoding
+keeps per-call state on the model, so each replica serves one request at a
+time; 1 replica means maximum sharing, more replicas trade memory for
+parallel requests. With --max-batch > 1 each replica drains a shared
+micro-batching queue (app/services/asr_batching.py) instead.
+"""
+import argparse
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from app.services import asr
+from app.services.asr_batching import BatchingTranscriber
+
+
+class ReplicaPool:
+    """Up to `size` copies of one model, handed out one request at a time."""
+
+    def __init__(self, model_name: str, size: int):
+        self.model_name = model_name
+        self.size = size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        import whisper
+        print(f"[model-server] loading whisper '{self.model_name}' replica {self._created + 1}/{self.size}")
+        return whisper.load_model(self.model_name)
+
+    def preload(self):
+        while self._created < self.size:
+            self._idle.put(self._load())
+            self._created += 1
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._load()
+        return self._idle.get()
+
+    def release(self, model):
+        self._idle.put(model)
+
+    def transcribe(self, audio, **options) -> dict:
+        model = self.acquire()
+        try:
+            return model.transcribe(audio, **options)
+        finally:
+            self.release(model)
+
+
+class ModelServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, concurrency: int, preload=(), max_batch: int = 1, max_wait_ms: float = 10.0):
+        self.concurrency = concurrency
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.pools = {}
+        self._pools_lock = threading.Lock()
+        self.started_at = time.time()
+        for name in preload:
+            pool = self.pool(name)
+            if isinstance(pool, ReplicaPool):
+                pool.preload()
+        super().__init__(socket_path, RequestHandler)
+
+    def pool(self, model_name: str):
+        """ReplicaPool, or a BatchingTranscriber when micro-batching is on."""
+        with self._pools_lock:
+            pool = self.pools.get(model_name)
+            if pool is None or getattr(pool, "failed", False):
+                if self.max_batch > 1:
+                    import whisper
+                    self.pools[model_name] = BatchingTranscriber(
+                        lambda: whisper.load_model(model_name),
+                        max_batch=self.max_batch,
+                        max_wait_ms=self.max_wait_ms,
+                        workers=self.concurrency,
+                    )
+                else:
+                    self.pools[model_name] = ReplicaPool(model_name, self.concurrency)
+            return self.pools[model_name]
+
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            header, payload = asr.recv_message(self.request)
+        except (ConnectionError, ValueError):
+            return
+        try:
+            if header.get("op") == "ping":
+                response = {"ok": True, "models": sorted(self.server.pools), "uptime": time.time() - self.server.started_at}
+            elif header.get("op") == "transcribe":
+                response = {"ok": True, "result": self._transcribe(header, payload)}
+            else:
+                response = {"ok": False, "error": f"unknown op {header.get('op')!r}"}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        try:
+            asr.send_message(self.request, response)
+        except OSError:
+            pass  # client went away
+
+    def _transcribe(self, header: dict, payload: bytes) -> dict:
+        audio = asr.decode_audio(header, payload)
+        pool = self.server.pool(header.get("model") or asr.WHISPER_MODEL)
+        return pool.transcribe(audio, **header.get("options", {}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared Whisper inference server")
+    parser.add_argument("--socket", default=asr.MODEL_SERVER_SOCKET)
+    parser.add_argument("--models", default=asr.WHISPER_MODEL,
+                        help="comma-separated models to preload; others load on first use")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("MODEL_SERVER_CONCURRENCY", "1")),
+                        help="model replicas (parallel transcriptions) per model")
+    parser.add_argument("--max-batch", type=int, default=asr.ASR_MAX_BATCH,
+                        help="micro-batch size for concurrent short requests (1 disables)")
+    parser.add_argument("--max-wait-ms", type=float, default=asr.ASR_MAX_WAIT_MS,
+                        help="how long a request may wait for a batch to fill")
+    args = parser.parse_args()
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)  # stale socket from a previous run
+
+    preload = [m.strip() for m in args.models.split(",") if m.strip()]
+    server = ModelServer(args.socket, max(args.concurrency, 1), preload,
+                         max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    os.chmod(args.socket, 0o660)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"[model-server] listening on {args.socket} "
+          f"(concurrency={server.concurrency}, max_batch={server.max_batch})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
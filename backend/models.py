@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, JSON, ForeignKey, Float, LargeBinary, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -24,6 +24,37 @@ class AudioAnalysis(Base):
     pause_to_speech_analysis = Column(JSON)
     filler_word_analysis = Column(JSON)
     stress_analysis = Column(JSON)
+    # analysis_profiles name the results were computed with; their JSON shape
+    # depends on it. NULL for rows from before profiles (basic analyzers)
+    analysis_profile = Column(String(32), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="analyses")
+    tracks = relationship("FeatureTrack", back_populates="analysis", cascade="all, delete-orphan")
+
+class FeatureTrack(Base):
+    __tablename__ = "feature_tracks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_id = Column(Integer, ForeignKey("audio_analyses.id"), index=True)
+    name = Column(String(64))           # e.g. "rms", "f0", "mfcc"
+    dtype = Column(String(16))          # "float16" / "float32"
+    n_frames = Column(Integer)
+    n_channels = Column(Integer)        # 1 for scalar tracks, 13 for MFCC
+    frame_rate = Column(Float)          # frames per second
+    encoding = Column(String(16))       # compression applied to data
+    data = Column(LargeBinary(length=2**32 - 1))  # LONGBLOB on MySQL
+
+    analysis = relationship("AudioAnalysis", back_populates="tracks")
+
+class ReanalysisCheckpoint(Base):
+    """Progress of a reanalyze.py job, one row per finished analysis."""
+    __tablename__ = "reanalysis_checkpoints"
+    __table_args__ = (UniqueConstraint("job", "analysis_id"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    job = Column(String(128), index=True)
+    analysis_id = Column(Integer, ForeignKey("audio_analyses.id"), index=True)
+    status = Column(String(16))         # "done", "failed", "missing_audio"
+    error = Column(String(1000), nullable=True)
+    finished_at = Column(DateTime)
@@ -0,0 +1,317 @@
+"""
+Re-run selected analyzers over stored audio and update AudioAnalysis rows.
+
+Use after changing an analyzer (stress heuristics, ASR model, ...) so old
+results match what /analyze-audio would produce today. Files are analyzed
+in a process pool; results are written in batched transactions together
+with a per-job checkpoint (reanalysis_checkpoints), so an interrupted run
+resumes where it stopped when started again with the same --job.
+
+Audio comes from the audio store when AUDIO_STORE_DIR is set (a
+memory-mapped 16 kHz cache, no decoding), otherwise from
+<audio-dir>/<file_id>.<ext>. Rows whose audio is gone are checkpointed
+as "missing_audio" and skipped. If an analyzer reports an error (e.g. the
+ASR backend is down) the stored results are left untouched and the row is
+checkpointed as "failed"; failed rows are retried when the job resumes.
+
+Each row is rerun with the analysis profile it was made with
+(AudioAnalysis.analysis_profile): the same analyzer variants, Whisper model,
+decoding and denoise setting, so the stored JSON keeps its shape. Rows from
+before profiles were recorded use `balanced`, whose basic analyzers produced
+them. Rows naming a profile that no longer exists are checkpointed as
+"unsupported_profile" and left untouched.
+
+When only frame-based analyzers run (pause, stress of the basic stack), recordings
+longer than ANALYSIS_STREAM_MIN_SECONDS are preprocessed and analyzed in
+blocks, so a worker's memory doesn't grow with the recording. Inputs that
+preprocessing would resample are loaded whole as before.
+
+For the filler analyzer start model_server.py first, otherwise every
+worker process loads its own Whisper copy.
+
+Usage:
+    python reanalyze.py --analyzers stress
+    python reanalyze.py --analyzers pause,stress,filler --workers 4 --job asr-small-2024
+    python reanalyze.py --analyzers stress --user-id 3 --restart
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from database import Base, engine, SessionLocal, add_missing_columns
+import models
+
+# Analyzers that have a column on AudioAnalysis, and how to store their result
+COLUMNS = {
+    "pause": "pause_to_speech_analysis",
+    "filler": "filler_word_analysis",
+    "stress": "stress_analysis",
+}
+AUDIO_EXTENSIONS = (".wav", ".flac", ".webm", ".ogg", ".mp3")
+# Analyzers that only need frame RMS and sample signs, which a blockwise pass provides
+STREAMABLE = {"pause", "stress"}
+# Checkpoint statuses that are final without a result; their rows aren't selected again
+SKIPPED = ("missing_audio", "unsupported_profile")
+# Profile for rows stored before AudioAnalysis.analysis_profile existed (basic analyzers)
+LEGACY_PROFILE = "balanced"
+
+
+def find_audio(file_id: str, audio_dir: str):
+    from app.services import audio_store
+    path = audio_store.cache_path(file_id)
+    if path:
+        return path
+    for ext in AUDIO_EXTENSIONS:
+        path = os.path.join(audio_dir, file_id + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# -------------------
+# Worker process
+# -------------------
+_worker_options = {}
+
+
+def _init_worker(options: dict):
+    _worker_options.update(options)
+    # Import the heavy modules once per process, not once per file
+    from app.services import pipeline  # noqa: F401
+
+
+def _decode(path: str):
+    from app.services import audio_store
+    from app.services.analysis.audio_io import segment_to_array
+    if path.endswith(".f32"):
+        return audio_store.load(path)
+    if path.endswith((".wav", ".flac")):
+        return path, None
+    from pydub import AudioSegment
+    samples, sr = segment_to_array(AudioSegment.from_file(path))
+    return samples, sr
+
+
+def _stream_source(path: str):
+    """(blockwise source, sample_rate, seconds) for a stored file, or None if it must be decoded."""
+    from app.services import audio_store
+    if path.endswith(".f32"):
+        samples, sr = audio_store.load(path)  # memory-mapped; blocks are copied out one at a time
+        return samples, sr, len(samples) / sr
+    if path.endswith((".wav", ".flac")):
+        import soundfile as sf
+        info = sf.info(path)
+        return path, info.samplerate, info.duration
+    return None
+
+
+def analyze_streaming(path: str, targets: list):
+    """
+    Blockwise equivalent of preprocess_audio + pipeline.run when every
+    target node is STREAMABLE. Returns (results, tracks, audio_seconds), or
+    None when the recording is short or needs the in-memory path.
+    """
+    from analysis.audio_features import get_pause_to_speech_ratio
+    from analysis.stress_detection import analyze_stress
+    from app.services.analysis.streaming import STREAM_MIN_SECONDS, FrameRMS, ZeroCrossings, preprocessed_blocks
+
+    if not _worker_options.get("stream", True) or not set(targets) <= STREAMABLE:
+        return None
+    source = _stream_source(path)
+    if source is None or source[2] <= STREAM_MIN_SECONDS:
+        return None
+    source, sr, seconds = source
+    blocks = preprocessed_blocks(source, sample_rate=sr, target_sr=_worker_options["sample_rate"])
+    if blocks is None:
+        return None
+    frames, crossings = FrameRMS(sr), ZeroCrossings()
+    for block in blocks:
+        frames.update(block)
+        crossings.update(block)
+    frames = (frames.finish(), frames.hop_length)
+
+    tracks, results = {}, {}
+    if "pause" in targets:
+        results["pause"] = get_pause_to_speech_ratio(tracks=tracks, sr=sr, frames=frames)
+    if "stress" in targets:
+        results["stress"] = analyze_stress(sr=sr, frames=frames, zero_crossings=crossings)
+    return results, tracks, seconds
+
+
+def analyze_one(task):
+    """(analysis_id, path, profile name) -> (analysis_id, results, tracks, audio_seconds, error)"""
+    from app.services import analysis_profiles, pipeline
+    from app.services.analysis.preprocess import preprocess_audio
+
+    analysis_id, path, profile_name = task
+    try:
+        # Same nodes and settings as the request that stored the row
+        profile = analysis_profiles.get(profile_name or LEGACY_PROFILE)
+        targets = [profile.analyzers[name] for name in _worker_options["analyzers"]]
+        streamed = analyze_streaming(path, targets)
+        if streamed is not None:
+            results, tracks, seconds = streamed
+            return analysis_id, {profile.slot(name): value for name, value in results.items()}, tracks, seconds, None
+        audio, sr = _decode(path)
+        y, sr = preprocess_audio(audio, sr=sr, target_sr=_worker_options["sample_rate"])
+        tracks = {}
+        results = pipeline.run({"waveform": (y, sr), "tracks": tracks, "asr_options": profile.asr_options(),
+                                "speech_options": {"denoise": _worker_options["denoise"] and profile.denoise}},
+                               targets=targets)
+        results = {profile.slot(name): value for name, value in results.items()}
+        # Analyzers catch their own failures and return {"error": ...};
+        # storing that would overwrite a good result with an empty one
+        errors = [f"{name}: {result['error']}" for name, result in results.items()
+                  if isinstance(result, dict) and result.get("error")]
+        if errors:
+            return analysis_id, None, None, len(y) / sr, "; ".join(errors)
+        return analysis_id, results, tracks, len(y) / sr, None
+    except Exception as e:
+        return analysis_id, None, None, 0.0, f"{type(e).__name__}: {e}"
+
+
+# -------------------
+# Parent process
+# -------------------
+def select_rows(db, args, job: str):
+    query = db.query(models.AudioAnalysis.id, models.AudioAnalysis.file_id, models.AudioAnalysis.analysis_profile)
+    if args.user_id is not None:
+        query = query.filter(models.AudioAnalysis.user_id == args.user_id)
+    if args.file_ids:
+        query = query.filter(models.AudioAnalysis.file_id.in_(args.file_ids.split(",")))
+    done = db.query(models.ReanalysisCheckpoint.analysis_id).filter(
+        models.ReanalysisCheckpoint.job == job,
+        models.ReanalysisCheckpoint.status.in_(("done",) + SKIPPED))
+    query = query.filter(~models.AudioAnalysis.id.in_(done)).order_by(models.AudioAnalysis.id)
+    if args.limit:
+        query = query.limit(args.limit)
+    return query.all()
+
+
+def write_batch(db, job: str, batch: list, analyzers: list):
+    """Apply one batch of worker results and their checkpoints in a single transaction."""
+    from app.services import feature_tracks
+
+    now = datetime.now()
+    for analysis_id, results, tracks, _, error in batch:
+        status = "failed" if error else "done"
+        if error in SKIPPED:
+            status, error = error, None
+        if results is not None:
+            record = db.get(models.AudioAnalysis, analysis_id)
+            for name in analyzers:
+                setattr(record, COLUMNS[name], results[name])
+            if "filler" in analyzers:
+                record.transcription = results["filler"].get("transcription", "")
+            if tracks:
+                # Replace only the tracks this run recomputed
+                record.tracks = [t for t in record.tracks if t.name not in tracks] \
+                    + feature_tracks.to_rows(tracks)
+        checkpoint = db.query(models.ReanalysisCheckpoint).filter_by(
+            job=job, analysis_id=analysis_id).first()  # a retried "failed" row
+        if checkpoint is None:
+            checkpoint = models.ReanalysisCheckpoint(job=job, analysis_id=analysis_id)
+            db.add(checkpoint)
+        checkpoint.status = status
+        checkpoint.error = error[:1000] if error else None
+        checkpoint.finished_at = now
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--analyzers", required=True, help="comma-separated: " + ",".join(COLUMNS))
+    parser.add_argument("--job", default=None, help="checkpoint name (default: reanalyze-<analyzers>)")
+    parser.add_argument("--restart", action="store_true", help="forget this job's checkpoints first")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--batch-size", type=int, default=20, help="rows per DB transaction")
+    parser.add_argument("--audio-dir", default="uploads")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--file-ids", default=None, help="comma-separated file_ids")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--no-denoise", action="store_true")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="load long recordings whole instead of analyzing them blockwise")
+    args = parser.parse_args()
+
+    analyzers = [a.strip() for a in args.analyzers.split(",") if a.strip()]
+    unknown = [a for a in analyzers if a not in COLUMNS]
+    if unknown:
+        parser.error(f"unknown analyzers {unknown}; choose from {list(COLUMNS)}")
+    job = args.job or "reanalyze-" + "-".join(sorted(analyzers))
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine, models.AudioAnalysis.__table__)
+    db = SessionLocal()
+    try:
+        if args.restart:
+            db.query(models.ReanalysisCheckpoint).filter_by(job=job).delete()
+            db.commit()
+        rows = select_rows(db, args, job)
+        print(f"job {job!r}: {len(rows)} analyses to process with {args.workers} workers")
+
+        from app.services.analysis_profiles import PROFILES
+
+        tasks, batch = [], []
+        for analysis_id, file_id, profile_name in rows:
+            path = find_audio(file_id, args.audio_dir) if file_id else None
+            if profile_name is not None and profile_name not in PROFILES:
+                batch.append((analysis_id, None, None, 0.0, "unsupported_profile"))
+            elif path is None:
+                batch.append((analysis_id, None, None, 0.0, "missing_audio"))
+            else:
+                tasks.append((analysis_id, path, profile_name))
+
+        options = {"analyzers": analyzers, "sample_rate": args.sample_rate,
+                   "denoise": not args.no_denoise, "stream": not args.no_stream}
+        counts = {"done": 0, "failed": 0, **{status: sum(1 for r in batch if r[4] == status) for status in SKIPPED}}
+        audio_seconds = 0.0
+        start = time.perf_counter()
+
+        def flush():
+            write_batch(db, job, batch, analyzers)
+            batch.clear()
+            elapsed = time.perf_counter() - start
+            processed = counts["done"] + counts["failed"]
+            print(f"  {processed}/{len(tasks)} files  {processed / elapsed:6.2f} files/s  "
+                  f"{audio_seconds / elapsed:7.1f}x realtime  failed={counts['failed']}")
+
+        if batch:
+            write_batch(db, job, batch, analyzers)
+            batch.clear()
+        if tasks:
+            # spawn: workers must not inherit torch / thread-pool state from the parent
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(args.workers, initializer=_init_worker, initargs=(options,)) as pool:
+                for result in pool.imap_unordered(analyze_one, tasks):
+                    counts["failed" if result[4] else "done"] += 1
+                    audio_seconds += result[3]
+                    if result[4]:
+                        print(f"  analysis {result[0]} failed: {result[4]}")
+                    batch.append(result)
+                    if len(batch) >= args.batch_size:
+                        flush()
+            if batch:
+                flush()
+
+        elapsed = time.perf_counter() - start
+        print(f"\nfinished in {elapsed:.1f} s: {counts['done']} updated, {counts['failed']} failed, "
+              f"{counts['missing_audio']} without audio, {counts['unsupported_profile']} with an unknown profile; "
+              f"{audio_seconds:.0f} s of audio ({audio_seconds / max(elapsed, 1e-9):.1f}x realtime)")
+    except KeyboardInterrupt:
+        db.rollback()
+        print("\ninterrupted; completed batches are checkpointed, rerun the same command to resume")
+        sys.exit(130)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from fastapi.responses import FileResponse
+import json
+import os
+import schemas
+from routers.auth import require_admin
+from app.services import export, profiling
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+# -------------------
+# Request profiling
+# -------------------
+@router.get("/profiling")
+def get_profiling_settings():
+    return profiling.settings
+
+@router.put("/profiling")
+def update_profiling_settings(payload: schemas.ProfilingSettings):
+    if not 0.0 <= payload.sample_rate <= 1.0:
+        raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+    profiling.settings["enabled"] = payload.enabled
+    profiling.settings["sample_rate"] = payload.sample_rate
+    return profiling.settings
+
+@router.get("/profiles")
+def list_profiles():
+    return profiling.list_reports()
+
+@router.get("/profiles/{name}")
+def get_profile_report(name: str, raw: bool = False):
+    """JSON summary of one report; `?raw=true` downloads the pstats file."""
+    if os.path.basename(name) != name:
+        raise HTTPException(status_code=400, detail="Invalid report name")
+    path = os.path.join(profiling.PROFILE_DIR, f"{name}.prof" if raw else f"{name}.json")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile report not found")
+    if raw:
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{name}.prof")
+    with open(path) as f:
+        return json.load(f)
+
+# -------------------
+# Cohort export
+# -------------------
+@router.get("/analyses/export")
+def export_cohort(
+    user_id: Optional[List[int]] = Query(None),
+    gzip: bool = False
+):
+    """Streamed NDJSON of the given users' analyses (repeat user_id), or everyone's."""
+    return export.ndjson_response(user_id, compress=gzip, filename="analyses-cohort.ndjson")
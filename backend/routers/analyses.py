@@ -0,0 +1,146 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.orm import Session
+from database import get_db
+import models
+from routers.auth import get_current_user
+from app.services import export, feature_tracks, transcript_search
+
+router = APIRouter(prefix="/analyses", tags=["Analyses"])
+
+
+def _get_owned_analysis(db: Session, file_id: str, user: models.User) -> models.AudioAnalysis:
+    analysis = db.query(models.AudioAnalysis).filter(
+        models.AudioAnalysis.file_id == file_id,
+        models.AudioAnalysis.user_id == user.id
+    ).first()
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return analysis
+
+
+def _parse_byte_range(header: str, size: int):
+    """
+    Parse a single-range `Range: bytes=start-end` header.
+    Returns (start, end) inclusive, or None when the header should be ignored.
+    Raises HTTPException(416) for unsatisfiable ranges.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if start_s == "":
+            # suffix range: last N bytes
+            length = int(end_s)
+            if length <= 0:
+                raise ValueError
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+
+# -------------------
+# Transcript search
+# -------------------
+@router.get("/search")
+def search_transcripts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over the user's transcripts, most relevant first."""
+    return {
+        "query": q,
+        "results": transcript_search.search(db, current_user.id, q, limit=limit, offset=offset),
+    }
+
+
+# -------------------
+# Export
+# -------------------
+@router.get("/export")
+def export_analyses(
+    gzip: bool = False,
+    current_user: models.User = Depends(get_current_user)
+):
+    """All of the user's analyses as streamed NDJSON (one object per line)."""
+    return export.ndjson_response([current_user.id], compress=gzip,
+                                  filename=f"analyses-{current_user.id}.ndjson")
+
+
+# -------------------
+# Frame-level feature tracks
+# -------------------
+@router.get("/{file_id}/tracks")
+def list_tracks(
+    file_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    analysis = _get_owned_analysis(db, file_id, current_user)
+    return [
+        {
+            "name": t.name,
+            "dtype": t.dtype,
+            "n_frames": t.n_frames,
+            "n_channels": t.n_channels,
+            "frame_rate": t.frame_rate,
+            "bytes": t.n_frames * t.n_channels * (2 if t.dtype == "float16" else 4),
+        }
+        for t in analysis.tracks
+    ]
+
+
+@router.get("/{file_id}/tracks/{name}")
+def get_track(
+    file_id: str,
+    name: str,
+    request: Request,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Returns the raw little-endian track array (frames x channels, row-major).
+    Supports `Range: bytes=...` so charts can fetch just the visible window.
+    """
+    analysis = _get_owned_analysis(db, file_id, current_user)
+    track = next((t for t in analysis.tracks if t.name == name), None)
+    if track is None:
+        raise HTTPException(status_code=404, detail="Track not found")
+
+    payload = feature_tracks.decode_track(track.data)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "X-Track-Dtype": track.dtype,
+        "X-Track-Shape": f"{track.n_frames},{track.n_channels}",
+        "X-Frame-Rate": str(track.frame_rate),
+    }
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = _parse_byte_range(range_header, len(payload))
+
+    if byte_range is None:
+        return Response(content=payload, media_type="application/octet-stream", headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(payload)}"
+    return Response(
+        content=payload[start:end + 1],
+        status_code=206,
+        media_type="application/octet-stream",
+        headers=headers
+    )
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 import models, schemas, security
 from database import get_db
 from jose import jwt, JWTError
+import os
+import secrets
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Operator endpoints (profiling, cohort exports) are disabled unless set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # -----------------------
 # Dependency - Get current user
 # -----------------------
@@ -35,6 +40,14 @@ async def get_current_user(
         raise credentials_exception
     return user
 
+# -----------------------
+# Dependency - Require admin token
+# -----------------------
+def require_admin(x_admin_token: str = Header(None)):
+    """Allow the request only if X-Admin-Token matches ADMIN_TOKEN"""
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+
 @router.post("/register", response_model=schemas.UserOut)
 def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     existing = db.query(models.User).filter(models.User.email == user.email).first()
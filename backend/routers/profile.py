@@ -1,14 +1,29 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, Form, HTTPException, Request, Response
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from email.utils import formatdate, parsedate_to_datetime
+import hashlib
 import os
+import re
+import secrets
 from database import get_db
 import models
 from routers.auth import get_current_user, security
 
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are optional; originals are served instead
+    Image = None
+
 router = APIRouter(prefix="/profile", tags=["Profile"])
 UPLOAD_DIR = "uploads/profile_pics"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+MAX_PHOTO_BYTES = int(os.getenv("MAX_PROFILE_PHOTO_BYTES", 5 * 1024 * 1024))
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZES = (64, 160)  # square edge in px, ascending
+_PHOTO_TOKEN = re.compile(r"^[0-9a-f]{32}$")
+
 @router.get("/me")
 async def get_profile(current_user: models.User = Depends(get_current_user)):
     return current_user
@@ -29,16 +44,131 @@ async def update_profile(
     db.refresh(user)
     return {"message": "Profile updated", "user": user}
 
+# Each upload is stored under a fresh random token, so photo URLs can't be
+# enumerated and a new photo never shares file names with the old one.
+def _photo_path(token: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{token}.png")
+
+
+def _thumbnail_path(token: str, size: int) -> str:
+    return os.path.join(UPLOAD_DIR, f"{token}_{size}.jpg")
+
+
+def _photo_token(file_path: str):
+    token = os.path.splitext(os.path.basename(file_path or ""))[0]
+    return token if _PHOTO_TOKEN.match(token) else None
+
+
+def _remove_photo(token: str):
+    for path in [_photo_path(token)] + [_thumbnail_path(token, s) for s in THUMBNAIL_SIZES]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def generate_thumbnails(file_path: str, token: str):
+    """Background job: write square JPEG thumbnails next to the original."""
+    if Image is None:
+        return
+    try:
+        with Image.open(file_path) as img:
+            img = img.convert("RGB")
+            # centre-crop to a square before downscaling
+            edge = min(img.size)
+            left = (img.width - edge) // 2
+            top = (img.height - edge) // 2
+            img = img.crop((left, top, left + edge, top + edge))
+            for size in THUMBNAIL_SIZES:
+                thumb = img.resize((size, size), Image.LANCZOS)
+                tmp_path = _thumbnail_path(token, size) + ".tmp"
+                thumb.save(tmp_path, format="JPEG", quality=85, optimize=True)
+                os.replace(tmp_path, _thumbnail_path(token, size))
+        if not os.path.exists(file_path):
+            _remove_photo(token)  # replaced while we were resizing
+    except Exception as e:
+        print(f"Error generating thumbnails for {token}: {str(e)}")
+
+
 @router.post("/upload-photo")
 async def upload_profile_pic(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    file_path = os.path.join(UPLOAD_DIR, f"user_{current_user.id}.png")
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    if file.content_type and not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=415, detail="Profile picture must be an image")
+
+    token = secrets.token_hex(16)
+    file_path = _photo_path(token)
+    tmp_path = file_path + ".part"
+
+    # Stream to disk in chunks so large uploads never sit in memory
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := await file.read(CHUNK_SIZE):
+                written += len(chunk)
+                if written > MAX_PHOTO_BYTES:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Profile picture exceeds {MAX_PHOTO_BYTES} bytes"
+                    )
+                f.write(chunk)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    background_tasks.add_task(generate_thumbnails, file_path, token)
 
+    old_token = _photo_token(current_user.profile_pic)
     current_user.profile_pic = file_path
     db.commit()
-    return {"message": "Profile picture uploaded", "file_path": file_path}
+    if old_token:
+        _remove_photo(old_token)
+    return {
+        "message": "Profile picture uploaded",
+        "file_path": file_path,
+        "photo_url": f"/profile/photo/{token}"
+    }
+
+
+@router.get("/photo/{token}")
+def get_profile_pic(token: str, request: Request, size: int = None):
+    """
+    Serve a profile picture by the token from its upload's `photo_url`,
+    preferring the smallest thumbnail >= `size`.
+    Supports conditional GET via ETag / Last-Modified (304 Not Modified).
+    """
+    if not _PHOTO_TOKEN.match(token):
+        raise HTTPException(status_code=404, detail="Profile picture not found")
+    candidates = []
+    if size:
+        candidates += [_thumbnail_path(token, s) for s in THUMBNAIL_SIZES if s >= size]
+    candidates.append(_photo_path(token))
+    path = next((p for p in candidates if os.path.exists(p)), None)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile picture not found")
+
+    stat = os.stat(path)
+    etag = '"' + hashlib.md5(f"{path}-{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": "no-cache",  # cache, but revalidate with the validators above
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since:
+        try:
+            if int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    media_type = "image/jpeg" if path.endswith(".jpg") else None
+    return FileResponse(path, media_type=media_type, headers=headers)
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException
+import models
+import schemas
+from routers.auth import get_current_user
+from app.services.question_cache import GenerationFailed, question_cache
+
+router = APIRouter(prefix="/questions", tags=["Questions"])
+
+
+@router.post("")
+async def get_question_set(
+    body: schemas.QuestionSetRequest,
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Interview questions for a role/company: precomputed or cached sets are
+    returned immediately; otherwise one upstream generation is shared by
+    all concurrent requests for the same pair.
+    """
+    try:
+        data, source = await question_cache.get(body.job_role, body.company_name)
+    except GenerationFailed as e:
+        raise HTTPException(status_code=502, detail=f"Question generation failed: {e}")
+    return {
+        "role": data.get("role", body.job_role),
+        "company": data.get("company", body.company_name),
+        "questions": data["questions"],
+        "keywords": data.get("keywords"),
+        "source": source,
+    }
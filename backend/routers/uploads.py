@@ -0,0 +1,81 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+import models
+import schemas
+from routers.auth import get_current_user
+from app.services import upload_sessions
+
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+# Finalizing (POST /uploads/{upload_id}/finalize) runs the analysis, so it
+# lives in main.py next to /analyze-audio.
+
+
+def _session_or_404(upload_id: str, user: models.User) -> dict:
+    try:
+        return upload_sessions.get(upload_id, user.id)
+    except upload_sessions.UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+
+
+@router.post("", status_code=201)
+async def create_upload(
+    body: schemas.UploadSessionCreate,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Start a resumable upload; send chunks with PUT /uploads/{upload_id}?offset=N."""
+    try:
+        meta = await run_in_threadpool(upload_sessions.create, current_user.id, body.total_size, body.filename)
+    except upload_sessions.InvalidChunk as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except upload_sessions.QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return upload_sessions.describe(meta)
+
+
+@router.put("/{upload_id}")
+async def put_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Write the raw request body at `offset`. Safe to repeat after a failed attempt."""
+    _session_or_404(upload_id, current_user)
+    length = request.headers.get("content-length")
+    if length is not None and not length.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if length is not None and int(length) > upload_sessions.UPLOAD_MAX_CHUNK_BYTES:
+        raise HTTPException(status_code=413, detail="Chunk too large")
+    # Read incrementally: without a Content-Length (chunked encoding) the body
+    # size is only known as it arrives, so stop at the cap instead of buffering it all
+    parts, received = [], 0
+    async for part in request.stream():
+        received += len(part)
+        if received > upload_sessions.UPLOAD_MAX_CHUNK_BYTES:
+            raise HTTPException(status_code=413, detail="Chunk too large")
+        parts.append(part)
+    data = b"".join(parts)
+    del parts
+    try:
+        meta = await run_in_threadpool(upload_sessions.write_chunk, upload_id, current_user.id, offset, data)
+    except upload_sessions.UploadNotFound:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    except upload_sessions.InvalidChunk as e:
+        raise HTTPException(status_code=416, detail=str(e))
+    except upload_sessions.UploadBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return upload_sessions.describe(meta)
+
+
+@router.get("/{upload_id}")
+async def get_upload(upload_id: str, current_user: models.User = Depends(get_current_user)):
+    """Received and missing byte ranges, to resume after a failure."""
+    return upload_sessions.describe(_session_or_404(upload_id, current_user))
+
+
+@router.delete("/{upload_id}", status_code=204)
+async def delete_upload(upload_id: str, current_user: models.User = Depends(get_current_user)):
+    if upload_sessions.describe(_session_or_404(upload_id, current_user))["finalizing"]:
+        raise HTTPException(status_code=409, detail="Upload is being analyzed")
+    upload_sessions.delete(upload_id)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, Any
 
 class UserCreate(BaseModel):
@@ -24,3 +24,15 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+
+class ProfilingSettings(BaseModel):
+    enabled: bool
+    sample_rate: float = 0.0
+
+class QuestionSetRequest(BaseModel):
+    job_role: str = Field(..., min_length=1, max_length=200)
+    company_name: str = Field(..., min_length=1, max_length=200)
+
+class UploadSessionCreate(BaseModel):
+    total_size: Optional[int] = Field(None, gt=0)
+    filename: Optional[str] = Field(None, max_length=255)
@@ -5,6 +5,12 @@ import AudioPlayer from "react-h5-audio-player";
 import { useNavigate } from "react-router-dom";
 import "react-h5-audio-player/lib/styles.css";
 
+// Opt-in (REACT_APP_RAW_PCM_UPLOAD=true): upload 16 kHz mono float32 PCM captured
+// from the AudioContext instead of the WebM blob, so the backend skips container
+// decoding. The WebM recording is still used for playback.
+const RAW_PCM_UPLOAD = process.env.REACT_APP_RAW_PCM_UPLOAD === "true";
+const PCM_SAMPLE_RATE = 16000;
+
 function AudioRecorder() {
   const [isRecording, setIsRecording] = useState(false);
   const [audioURL, setAudioURL] = useState("");
@@ -19,6 +25,7 @@ function AudioRecorder() {
   const [started, setStarted] = useState(false);
   const [loadingQuestions, setLoadingQuestions] = useState(false);
   const [analysisDone, setAnalysisDone] = useState(false);
+  const [analysisStage, setAnalysisStage] = useState("");
 
   const mediaRecorderRef = useRef(null);
   const audioChunksRef = useRef([]);
@@ -26,6 +33,8 @@ function AudioRecorder() {
   const animationIdRef = useRef(null);
   const analyserRef = useRef(null);
   const audioContextRef = useRef(null);
+  const pcmChunksRef = useRef([]);
+  const pcmSampleRateRef = useRef(PCM_SAMPLE_RATE);
 
   const navigate = useNavigate();
 
@@ -34,20 +43,23 @@ function AudioRecorder() {
     navigate("/login");
   };
 
-  // 🔹 Fetch interview questions from n8n
+  // 🔹 Fetch interview questions (backend caches / coalesces the n8n generation)
   const fetchQuestions = async () => {
     if (!jobRole || !companyName) {
       alert("Please enter both Job Role and Company Name");
       return;
     }
+    const token = localStorage.getItem("token");
+    if (!token) return alert("Login expired. Please login again.");
     setLoadingQuestions(true);
 
     try {
-      const webhookUrl = "http://localhost:5678/webhook-test/job-questions";
-
-      const res = await fetch(webhookUrl, {
+      const res = await fetch("http://localhost:8000/questions", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${token}`,
+        },
         body: JSON.stringify({
           job_role: jobRole.trim(),
           company_name: companyName.trim(),
@@ -55,7 +67,9 @@ function AudioRecorder() {
       });
 
       const data = await res.json();
-      if (Array.isArray(data.questions) && data.questions.length > 0) {
+      if (!res.ok) {
+        alert(data.detail || "Could not load interview questions");
+      } else if (Array.isArray(data.questions) && data.questions.length > 0) {
         setQuestions(data.questions);
         setStarted(true);
       } else {
@@ -63,7 +77,7 @@ function AudioRecorder() {
       }
     } catch (err) {
       console.error("Error fetching questions:", err);
-      alert("Failed to connect to n8n webhook");
+      alert("Failed to connect to the question service");
     } finally {
       setLoadingQuestions(false);
     }
@@ -88,12 +102,26 @@ function AudioRecorder() {
     mediaRecorderRef.current.onstop = handleStop;
     mediaRecorderRef.current.start();
 
-    audioContextRef.current = new (window.AudioContext || window.webkitAudioContext)();
+    const AudioContextClass = window.AudioContext || window.webkitAudioContext;
+    audioContextRef.current = RAW_PCM_UPLOAD
+      ? new AudioContextClass({ sampleRate: PCM_SAMPLE_RATE })
+      : new AudioContextClass();
     const source = audioContextRef.current.createMediaStreamSource(stream);
     analyserRef.current = audioContextRef.current.createAnalyser();
     analyserRef.current.fftSize = 2048;
     source.connect(analyserRef.current);
 
+    if (RAW_PCM_UPLOAD) {
+      pcmChunksRef.current = [];
+      pcmSampleRateRef.current = audioContextRef.current.sampleRate;
+      const processor = audioContextRef.current.createScriptProcessor(4096, 1, 1);
+      processor.onaudioprocess = (e) => {
+        pcmChunksRef.current.push(new Float32Array(e.inputBuffer.getChannelData(0)));
+      };
+      source.connect(processor);
+      processor.connect(audioContextRef.current.destination); // outputs silence; needed for callbacks
+    }
+
     drawWaveform();
   };
 
@@ -143,34 +171,102 @@ function AudioRecorder() {
     const blob = new Blob(audioChunksRef.current, { type: "audio/webm" });
     setAudioURL(URL.createObjectURL(blob));
     audioChunksRef.current = [];
+
+    if (RAW_PCM_UPLOAD && pcmChunksRef.current.length > 0) {
+      const length = pcmChunksRef.current.reduce((n, chunk) => n + chunk.length, 0);
+      const pcm = new Float32Array(length);
+      let offset = 0;
+      for (const chunk of pcmChunksRef.current) {
+        pcm.set(chunk, offset);
+        offset += chunk.length;
+      }
+      pcmChunksRef.current = [];
+      // Little-endian float32 on every platform Electron/Chrome runs on
+      sendAudioForAnalysis(new Blob([pcm.buffer], { type: "application/octet-stream" }), {
+        format: "pcm_f32le",
+        sample_rate: String(pcmSampleRateRef.current),
+      });
+      return;
+    }
     sendAudioForAnalysis(blob);
   };
 
-  // 🔹 Send audio to FastAPI backend
-  const sendAudioForAnalysis = async (blob) => {
+  // 🔹 Send audio to FastAPI backend; results stream in stage by stage (SSE)
+  const STAGE_LABELS = {
+    queued: "Uploaded, waiting for an analysis slot...",
+    convert: "Audio decoded, preprocessing...",
+    preprocess: "Analyzing pauses and stress...",
+    pause: "Pause analysis ready, transcribing...",
+    stress: "Stress analysis ready, transcribing...",
+    transcript: "Transcript ready, counting filler words...",
+  };
+
+  const handleStageEvent = (event, data) => {
+    if (STAGE_LABELS[event]) setAnalysisStage(STAGE_LABELS[event]);
+    if (event === "pause") setPauseAnalysis(data);
+    if (event === "stress") setStressAnalysis(data);
+    if (event === "transcript") setTranscription(data.text);
+    if (event === "filler") setFillerAnalysis(data);
+    if (event === "done") {
+      setPauseAnalysis(data.pause_to_speech_analysis);
+      setFillerAnalysis(data.filler_word_analysis);
+      setStressAnalysis(data.stress_analysis);
+      setTranscription(data.transcription);
+      setAnalysisStage("");
+      setAnalysisDone(true);
+    }
+    if (event === "error") {
+      setAnalysisStage("");
+      alert(data.detail || "Audio analysis failed.");
+    }
+  };
+
+  const sendAudioForAnalysis = async (blob, rawFormat = null) => {
     const token = localStorage.getItem("token");
     if (!token) return alert("Login expired. Please login again.");
 
     const formData = new FormData();
-    formData.append("file", blob, "response.webm");
+    formData.append("file", blob, rawFormat ? "response.pcm" : "response.webm");
+    const query = rawFormat ? `?${new URLSearchParams(rawFormat)}` : "";
+    setAnalysisStage("Uploading...");
 
     try {
-      const response = await fetch("http://localhost:8000/analyze-audio", {
+      const response = await fetch(`http://localhost:8000/analyze-audio/stream${query}`, {
         method: "POST",
         headers: { Authorization: `Bearer ${token}` },
         body: formData,
       });
+      if (!response.ok) {
+        const err = await response.json().catch(() => ({}));
+        setAnalysisStage("");
+        return alert(err.detail || "Audio upload failed.");
+      }
 
-      const result = await response.json();
-
-      setPauseAnalysis(result.pause_to_speech_analysis);
-      setFillerAnalysis(result.filler_word_analysis);
-      setStressAnalysis(result.stress_analysis);
-      setTranscription(result.transcription);
-      setAnalysisDone(true);
+      // Parse the text/event-stream body: blocks of "event: x\ndata: {...}" separated by blank lines
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buffer.indexOf("\n\n")) !== -1) {
+          const block = buffer.slice(0, sep);
+          buffer = buffer.slice(sep + 2);
+          let event = "message";
+          let data = "";
+          for (const line of block.split("\n")) {
+            if (line.startsWith("event:")) event = line.slice(6).trim();
+            else if (line.startsWith("data:")) data += line.slice(5).trim();
+          }
+          if (data) handleStageEvent(event, JSON.parse(data));
+        }
+      }
 
     } catch (error) {
       console.error("Analysis error:", error);
+      setAnalysisStage("");
       alert("Audio upload failed.");
     }
   };
@@ -187,6 +283,7 @@ function AudioRecorder() {
       setStressAnalysis(null);
       setTranscription("");
       setAnalysisDone(false);
+      setAnalysisStage("");
     } else {
       alert("🎉 Interview Completed!");
     }
@@ -268,8 +365,12 @@ function AudioRecorder() {
             </div>
           )}
 
-          {/* Analysis Results */}
-          {analysisDone && (
+          {analysisStage && (
+            <p className="text-center text-gray-400 mb-4">{analysisStage}</p>
+          )}
+
+          {/* Analysis Results (filled in as each stage finishes) */}
+          {(analysisDone || pauseAnalysis || stressAnalysis || transcription) && (
             <>
               {pauseAnalysis && (
                 <div className="mb-4 p-4 bg-gray-900 rounded border border-gray-700">
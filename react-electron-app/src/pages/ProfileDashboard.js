@@ -20,19 +20,25 @@ function ProfileDashboard() {
     try {
       setLoading(true);
       const token = localStorage.getItem("token");
-      const res = await fetch("http://localhost:8000/my-analyses", {
+      const res = await fetch("http://localhost:8000/profile/me", {
         headers: { Authorization: `Bearer ${token}` },
       });
 
       if (!res.ok) throw new Error("Failed to fetch profile data");
       const data = await res.json();
 
-      // Set demo user info (you can modify this when backend provides actual user info)
+      // Small cached thumbnail; the server answers 304 while it is unchanged.
+      // Photos are served by the random token in their stored file name.
+      const photoToken = data.profile_pic
+        ? data.profile_pic.split(/[\\/]/).pop().replace(/\.png$/, "")
+        : "";
       setUserData({
-        full_name: "Adwait Dharade",
-        username: "adwait.ai",
-        email: "adwait@example.com",
-        profile_pic: "",
+        full_name: data.full_name || "",
+        username: data.username || "",
+        email: data.email || "",
+        profile_pic: photoToken
+          ? `http://localhost:8000/profile/photo/${photoToken}?size=160`
+          : "",
       });
     } catch (err) {
       setError("Failed to load your data");
@@ -50,11 +56,25 @@ function ProfileDashboard() {
     alert("Profile editing feature coming soon!");
   };
 
-  const handleImageUpload = (e) => {
+  const handleImageUpload = async (e) => {
     const file = e.target.files[0];
-    if (file) {
-      const imageUrl = URL.createObjectURL(file);
-      setUserData((prev) => ({ ...prev, profile_pic: imageUrl }));
+    if (!file) return;
+
+    // Show the local preview immediately while the upload runs
+    setUserData((prev) => ({ ...prev, profile_pic: URL.createObjectURL(file) }));
+
+    const formData = new FormData();
+    formData.append("file", file);
+    try {
+      const token = localStorage.getItem("token");
+      const res = await fetch("http://localhost:8000/profile/upload-photo", {
+        method: "POST",
+        headers: { Authorization: `Bearer ${token}` },
+        body: formData,
+      });
+      if (!res.ok) throw new Error("Upload failed");
+    } catch (err) {
+      setError("Failed to upload profile picture");
     }
   };
 